@@ -0,0 +1,87 @@
+"""
+Benchmarks assembling a century of synthetic 'hourly_height' data from
+yearly chunks, comparing the old `df = pd.concat([df, temp])` loop with
+`ChunkAssembler`. Reports wall time and peak traced memory.
+
+Usage: python -B src/benchmark_chunk_assembler.py [start_year] [end_year]
+
+DS5110 Fall 2023 Project Team 8 SDG
+"""
+
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from chunk_assembler import ChunkAssembler
+
+def make_year_chunk(year):
+    """
+    Builds one year of hourly data shaped like the raw NOAA
+    'hourly_height' response merged with its predictions
+    """
+    dates = np.arange(f"{year}-01-01T00:00", f"{year + 1}-01-01T00:00",
+                      np.timedelta64(1, 'h'), dtype='datetime64[m]')
+    n = len(dates)
+    rng = np.random.default_rng(year)
+
+    return pd.DataFrame({
+        'Date Time': np.char.replace(np.datetime_as_string(dates), 'T', ' ').astype(object),
+        ' Water Level': rng.normal(5, 3, n).round(3),
+        ' Sigma': np.zeros(n),
+        ' I': np.zeros(n, dtype=np.int64),
+        ' L ': np.zeros(n, dtype=np.int64),
+        ' Prediction': rng.normal(5, 3, n).round(3),
+    })
+
+def assemble_with_concat(chunks):
+    df = pd.DataFrame()
+    for temp in chunks:
+        df = pd.concat([df, temp])
+
+    return df
+
+def assemble_with_assembler(chunks):
+    assembler = ChunkAssembler()
+    for temp in chunks:
+        assembler.add(temp)
+
+    return assembler.to_frame()
+
+def run(name, assemble, years):
+    # wall time of the assembly alone, chunks already in memory
+    chunks = [make_year_chunk(year) for year in years]
+    start_time = time.perf_counter()
+    df = assemble(chunks)
+    duration = time.perf_counter() - start_time
+    del chunks
+
+    # peak memory with chunks produced one at a time, as they arrive
+    # from the fetcher
+    chunks = (make_year_chunk(year) for year in years)
+    tracemalloc.start()
+    assemble(chunks)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    final_mb = df.memory_usage(deep=True).sum() / 1024 / 1024
+    print("{:<16} rows={:<9} time={:>7.3f}s peak={:>8.1f} MB final={:>7.1f} MB".format(
+        name, len(df), duration, peak / 1024 / 1024, final_mb))
+
+    return df
+
+def main():
+    start_year = int(sys.argv[1]) if len(sys.argv) > 1 else 1910
+    end_year = int(sys.argv[2]) if len(sys.argv) > 2 else 2023
+    years = range(start_year, end_year + 1)
+
+    print(f"Assembling synthetic hourly data for {start_year} to {end_year}")
+    old = run("pd.concat loop", assemble_with_concat, years)
+    new = run("ChunkAssembler", assemble_with_assembler, years)
+
+    # both approaches must produce the same frame
+    pd.testing.assert_frame_equal(old.reset_index(drop=True), new,
+                                  check_dtype=False)
+
+if __name__ == '__main__':
+    main()
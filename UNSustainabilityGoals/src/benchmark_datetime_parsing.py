@@ -0,0 +1,79 @@
+"""
+Benchmarks loading a clean 'water_level' csv with millions of rows,
+comparing the original split_date_time_col() + untyped pd.to_datetime()
+path with the typed ingestion in tides_cache.
+
+Usage: python -B src/benchmark_datetime_parsing.py [start_year] [end_year]
+
+DS5110 Fall 2023 Project Team 8 SDG
+"""
+
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from load_noaa_tides_data import split_date_time_col, add_date_time_columns
+from tides_cache import CsvCache
+
+def write_water_level_csv(filename, start_year, end_year):
+    """
+    Writes a synthetic clean 6-minute 'water_level' file in the layout of
+    data/noaa_water_level_{station_id}_clean.csv
+    """
+    dates = np.arange(f"{start_year}-01-01T00:00", f"{end_year + 1}-01-01T00:00",
+                      np.timedelta64(6, 'm'), dtype='datetime64[m]')
+    rng = np.random.default_rng(0)
+
+    df = pd.DataFrame({
+        'Date Time': np.char.replace(np.datetime_as_string(dates), 'T', ' '),
+        'Water Level': rng.normal(5, 3, len(dates)).round(3),
+        'Prediction': rng.normal(5, 3, len(dates)).round(3),
+    })
+    df.to_csv(filename, index=False)
+
+    return len(df)
+
+def load_original(filename):
+    # load path before typed ingestion
+    df = pd.read_csv(filename)
+    df = split_date_time_col(df)
+    df.index = pd.to_datetime(df['Date Time'].copy())
+
+    return df
+
+def load_typed(filename):
+    return CsvCache().read(filename)
+
+def load_typed_with_strings(filename):
+    return add_date_time_columns(CsvCache().read(filename))
+
+def run(name, load, filename):
+    start_time = time.perf_counter()
+    df = load(filename)
+    duration = time.perf_counter() - start_time
+
+    mem_mb = df.memory_usage(deep=True).sum() / 1024 / 1024
+    print("{:<28} time={:>6.2f}s memory={:>7.1f} MB".format(name, duration, mem_mb))
+
+    return df
+
+def main():
+    start_year = int(sys.argv[1]) if len(sys.argv) > 1 else 1996
+    end_year = int(sys.argv[2]) if len(sys.argv) > 2 else 2023
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, 'noaa_water_level_clean.csv')
+        rows = write_water_level_csv(filename, start_year, end_year)
+        print(f"Loading {rows} rows of 6-minute data for {start_year} to {end_year}")
+
+        old = run("split + untyped to_datetime", load_original, filename)
+        run("typed, strings on demand", load_typed_with_strings, filename)
+        new = run("typed, index only", load_typed, filename)
+
+    # same timestamps either way
+    assert old.index.equals(new.index)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmarks the monthly observed - predicted residual statistics for
+Portland's 1910 to present 'hourly_height' data. Compares the original
+path (string "Date Time" column parsed again, findDifference(), copies,
+groupby) and a groupby on the datetime index with the single pass in
+data_editing.monthly_residual_stats().
+
+Usage: python -B src/benchmark_residuals.py [station_id]
+
+Uses the clean data on disk (see load_noaa_tides_data.py), or synthetic
+hourly data for the same years if the station hasn't been downloaded.
+
+DS5110 Fall 2023 Project Team 8 SDG
+"""
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+from data_editing import findDifference, monthly_residual_stats
+from load_noaa_tides_data import add_date_time_columns
+from tides_cache import read_clean_data
+
+def make_hourly_height(start_year=1910, end_year=2023):
+    """
+    Builds synthetic clean 'hourly_height' data with a datetime index
+    """
+    dates = pd.date_range(f"{start_year}-01-01", f"{end_year}-09-30 23:00", freq='h',
+                          name='Date Time')
+    rng = np.random.default_rng(0)
+    prediction = 5 + 5 * np.sin(np.arange(len(dates)) * 2 * np.pi / 12.42)
+
+    return pd.DataFrame({
+        'Water Level': (prediction + rng.normal(0, 0.3, len(dates))).astype(np.float32),
+        'Prediction': prediction.astype(np.float32),
+    }, index=dates)
+
+def residuals_original(df):
+    # original path: "Date Time" strings back to datetimes, in place
+    # difference, column copy, then groupby
+    data = add_date_time_columns(df.copy())
+    data['Date Time'] = pd.to_datetime(data['Date Time'])
+    data = findDifference(data)
+    data = data[['Date Time', 'Difference']]
+    data = data.groupby(data['Date Time'].dt.to_period('M'))['Difference'] \
+        .agg(['mean', 'std', 'count'])
+
+    return data
+
+def residuals_groupby(df):
+    # datetime index, but still a copy with "Difference" and a pandas groupby
+    data = findDifference(df.copy())
+    data = data[['Difference']]
+
+    return data.groupby(data.index.to_period('M'))['Difference'].agg(['mean', 'std', 'count'])
+
+def residuals_fused(df):
+    return monthly_residual_stats(df)
+
+def run(name, compute, df, repeat=3):
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        result = compute(df)
+    duration = (time.perf_counter() - start_time) / repeat
+
+    print("{:<28} time={:>8.1f} ms".format(name, duration * 1000))
+
+    return result
+
+def main():
+    station_id = sys.argv[1] if len(sys.argv) > 1 else '8418150'
+
+    df = read_clean_data(f"data/noaa_hourly_height_{station_id}_clean")
+    if df is None:
+        df = make_hourly_height()
+        print(f"Residuals for {len(df)} rows of synthetic hourly data")
+    else:
+        print(f"Residuals for {len(df)} rows of station {station_id} 'hourly_height' data")
+
+    old = run("strings + findDifference", residuals_original, df)
+    run("index + groupby", residuals_groupby, df)
+    new = run("fused single pass", residuals_fused, df)
+
+    # same statistics either way
+    assert np.allclose(old['mean'], new['Difference'], atol=1e-5, equal_nan=True)
+    assert np.allclose(old['std'], new['Difference Std'], atol=1e-5, equal_nan=True)
+    assert (old['count'].to_numpy() == new['Difference Count'].to_numpy()).all()
+
+if __name__ == '__main__':
+    main()
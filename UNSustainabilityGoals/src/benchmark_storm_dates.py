@@ -0,0 +1,83 @@
+"""
+Benchmarks building the storm event dates for a full NCEI year, comparing
+the original string concatenation + pd.to_datetime() approach with the
+integer arithmetic in storm_helpers.storm_dates().
+
+Usage: python -B src/benchmark_storm_dates.py [details_csv]
+
+Without a details file a synthetic year the size of a recent NCEI year is
+used.
+
+DS5110 Fall 2023 Project Team 8 SDG
+"""
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+from storm_helpers import convert_and_merge_date_data, read_storm_csv
+
+# rows in a recent NCEI details file
+YEAR_ROWS = 70000
+
+def make_year(rows=YEAR_ROWS, year=2023):
+    """
+    Builds the integer date and time columns of one year of storm details
+    """
+    rng = np.random.default_rng(year)
+    month = rng.integers(1, 13, rows)
+    day = rng.integers(1, 29, rows)
+    hour = rng.integers(0, 24, rows)
+    minute = rng.integers(0, 60, rows)
+
+    return pd.DataFrame({
+        'BEGIN_YEARMONTH': (year * 100 + month).astype('int32'),
+        'BEGIN_DAY': day.astype('int8'),
+        'BEGIN_TIME': (hour * 100 + minute).astype('int16'),
+        'END_YEARMONTH': (year * 100 + month).astype('int32'),
+        'END_DAY': day.astype('int8'),
+        'END_TIME': (hour * 100 + np.minimum(minute + 30, 59)).astype('int16'),
+    })
+
+def convert_with_strings(input_df):
+    # original approach, extended to the end date and times of day
+    df = input_df.copy()
+
+    begin = df['BEGIN_YEARMONTH'].astype(str) + df['BEGIN_DAY'].astype(str).str.zfill(2)
+    end = df['END_YEARMONTH'].astype(str) + df['END_DAY'].astype(str).str.zfill(2)
+    df['BEGIN_DATE'] = pd.to_datetime(begin, format='%Y%m%d')
+    df['END_DATE'] = pd.to_datetime(end, format='%Y%m%d')
+    df['BEGIN_DATE_TIME'] = pd.to_datetime(
+        begin + df['BEGIN_TIME'].astype(str).str.zfill(4), format='%Y%m%d%H%M')
+    df['END_DATE_TIME'] = pd.to_datetime(
+        end + df['END_TIME'].astype(str).str.zfill(4), format='%Y%m%d%H%M')
+
+    return df
+
+def run(name, convert, df, repeat=5):
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        result = convert(df)
+    duration = (time.perf_counter() - start_time) / repeat
+
+    print("{:<24} time={:>7.1f} ms".format(name, duration * 1000))
+
+    return result
+
+def main():
+    if len(sys.argv) > 1:
+        df = read_storm_csv(sys.argv[1])
+        print(f"Building dates for {len(df)} rows of {sys.argv[1]}")
+    else:
+        df = make_year()
+        print(f"Building dates for {len(df)} rows of synthetic storm details")
+
+    old = run("strings + to_datetime", convert_with_strings, df)
+    new = run("integer arithmetic", convert_and_merge_date_data, df)
+
+    # same dates either way
+    for column in ['BEGIN_DATE', 'END_DATE', 'BEGIN_DATE_TIME', 'END_DATE_TIME']:
+        assert old[column].equals(new[column]), column
+
+if __name__ == '__main__':
+    main()
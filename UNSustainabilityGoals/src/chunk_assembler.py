@@ -0,0 +1,89 @@
+"""
+Assembles many small DataFrame chunks (one per month or year of NOAA data)
+into one DataFrame in a single pass.
+
+Appending with `df = pd.concat([df, temp])` inside a loop copies the whole
+growing frame on every iteration. `ChunkAssembler` instead keeps each
+chunk's columns as plain arrays and builds every output column with one
+concatenation when the frame is materialized.
+
+DS5110 Fall 2023 Project Team 8 SDG
+"""
+
+import numpy as np
+import pandas as pd
+
+class ChunkAssembler:
+    """
+    Collects DataFrame chunks and materializes them once with `to_frame()`
+
+        assembler = ChunkAssembler()
+        for temp in chunks:
+            assembler.add(temp)
+        df = assembler.to_frame()
+
+    Chunks are kept in the order they are added. Columns missing from a
+    chunk are filled with NaN, as `pd.concat` would do.
+    """
+
+    def __init__(self):
+        # column name -> list of arrays, or ints for a run of missing rows
+        self._parts = {}
+        self.rows = 0
+
+    def __len__(self):
+        return self.rows
+
+    def add(self, df):
+        """
+        Adds a chunk. `None` and empty chunks (e.g. failed NOAA requests)
+        are skipped.
+        """
+        if df is None or df.empty:
+            return
+
+        n = len(df)
+
+        for col in df.columns:
+            if col not in self._parts:
+                # column first seen in this chunk, earlier rows are missing
+                self._parts[col] = [self.rows] if self.rows else []
+
+            # copy so the chunk's own blocks can be freed once the caller
+            # drops it
+            self._parts[col].append(df[col].to_numpy(copy=True))
+
+        for col, parts in self._parts.items():
+            if col not in df.columns:
+                parts.append(n)
+
+        self.rows += n
+
+    def to_frame(self):
+        """
+        Returns all chunks as one DataFrame with a fresh RangeIndex and
+        empties the assembler.
+
+        Columns are concatenated one at a time and their parts released
+        right after, so peak memory is the final frame plus one column's
+        worth of parts rather than double the final frame.
+        """
+        data = {}
+
+        for col in list(self._parts):
+            parts = self._parts.pop(col)
+            data[col] = np.concatenate([_fill_missing(part) for part in parts])
+            del parts
+
+        self.rows = 0
+
+        return pd.DataFrame(data, copy=False)
+
+def _fill_missing(part):
+    """
+    Expands a missing-rows marker to an array of NaN
+    """
+    if isinstance(part, int):
+        return np.full(part, np.nan)
+
+    return part
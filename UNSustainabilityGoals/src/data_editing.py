@@ -1,8 +1,15 @@
+import numpy as np
 import pandas as pd
-from os.path import isfile
 from location_class import Location
-from helpers import save_csv, parse_year
-from load_noaa_tides_data import load_noaa_tides_data_product
+from helpers import parse_year
+from load_noaa_tides_data import load_noaa_tides_data_product, load_noaa_tides_data_products, \
+    get_data_stem
+from derived_cache import load_aggregate
+from monthly_rollup import monthly_means
+from tides_pyramid import query_pyramid
+from tides_cache import is_cached
+from tides_gaps import open_gap_index, MIN_MONTH_COVERAGE
+from tides_memmap import open_arrays
 
 def findDifference(data):
     data["Difference"] = data["Water Level"].sub(data["Prediction"])
@@ -12,24 +19,69 @@ def findDifference(data):
 def find_waterlvl_diff_avg_month(location):
     datafile = f'data/noaa_water_level_diff_avg_month_start_{parse_year(location.start_date)}_{location.station_id}.csv'
 
-    if isfile(datafile):
-        data = pd.read_csv(datafile)
-    else:
-        data = load_noaa_tides_data_product(location)
-        data = findDifference(data)
+    def compute():
+        # views of the memory-mapped 'hourly_height' arrays, no DataFrame
+        # is built for the full history
+        data = open_arrays(location, 'hourly_height').select(location)
 
-        # average by month
-        data['Date Time'] = pd.to_datetime(data['Date Time'], format='%Y-%m-%d %H:%M')
-        data = data[['Date Time', 'Water Level', 'Prediction', 'Difference']]
-        data = data.groupby(pd.PeriodIndex(data['Date Time'], freq='M')).mean()
+        # monthly mean, std and count of the residuals in one pass
+        data = monthly_residual_stats(data)
 
-        data.index.names = ['Month']
-
-        data = data.drop(columns=['Date Time', 'Water Level', 'Prediction'])
         # print("find_waterlvl_diff_avg_month() df:\n{}".format(data))
-        save_csv(data, datafile, True)
-
-    return data
+        return data
+
+    # recomputed only when the clean 'hourly_height' data changes
+    return load_aggregate(datafile, [get_data_stem(location, 'hourly_height')],
+                          location, compute)
+
+def monthly_residual_stats(data, observed='Water Level', predicted='Prediction'):
+    """
+    Returns the monthly mean ("Difference"), standard deviation and count of
+    the observed - predicted residuals, indexed by "Month" period. Works on
+    the timestamps and the numeric columns directly, `data` is not
+    modified.
+
+    Parameters
+    ----------
+    data : DataFrame or dict
+      Clean data with a datetime index, see load_noaa_tides_data_product(),
+      or arrays with a "Date Time" entry, see tides_memmap.TidesArrays.select()
+
+    observed, predicted : str, optional
+      Columns the residual is computed from
+    """
+    residual = np.asarray(data[observed], dtype=np.float64) - \
+        np.asarray(data[predicted], dtype=np.float64)
+    times = data.index.values if isinstance(data, pd.DataFrame) else data['Date Time']
+
+    # month number since 1970 of every row, from the parsed timestamps
+    months = times.astype('datetime64[M]').astype(np.int64)
+    first = months.min() if len(months) else 0
+    codes = months - first
+
+    valid = ~np.isnan(residual)
+    rows = np.bincount(codes)
+    count = np.bincount(codes[valid], minlength=len(rows))
+    total = np.bincount(codes[valid], weights=residual[valid], minlength=len(rows))
+
+    # sample standard deviation like DataFrame.std(), from the deviations
+    # around each month's mean. NaN for months with fewer than two values
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        squares = np.bincount(codes[valid], weights=(residual - mean[codes])[valid] ** 2,
+                              minlength=len(rows))
+        std = np.sqrt(squares / np.where(count > 1, count - 1, np.nan))
+
+    # months without any rows don't appear in the result
+    present = rows > 0
+    index = pd.PeriodIndex(
+        (np.flatnonzero(present) + first).astype('datetime64[M]'), freq='M', name='Month')
+
+    return pd.DataFrame({
+        'Difference': mean[present],
+        'Difference Std': std[present],
+        'Difference Count': count[present]
+    }, index=index)
 
 def averageData(data):
     df = pd.DataFrame()
@@ -42,19 +94,60 @@ def averageData(data):
 def average_by_month(location):
     datafile = f'data/noaa_water_level_avg_month_start_{parse_year(location.start_date)}_{location.station_id}.csv'
 
-    if isfile(datafile):
-        df = pd.read_csv(datafile)
-    else:
-        df = load_noaa_tides_data_product(location, 'water_level')
-
-        df['Date Time'] = pd.to_datetime(df['Date Time'], format='%Y-%m-%d %H:%M')
-        df = df[['Date Time', 'Water Level', 'Prediction']]
-        df = df.groupby(pd.PeriodIndex(df['Date Time'], freq='M')).mean()
+    def compute():
+        if not is_cached(get_data_stem(location, 'water_level')):
+            # downloads and cleans the data
+            load_noaa_tides_data_product(location, 'water_level',
+                                         date_time_columns=False)
 
-        df.index.names = ['Month']
+        # running monthly sums and counts, only the months added or
+        # updated since the last call are read
+        df = monthly_means(get_data_stem(location, 'water_level'),
+                           ['Water Level', 'Prediction'],
+                           location.start_date, location.end_date)
 
         # print("average_by_month() df:\n{}".format(df))
-        save_csv(df, datafile, True)
+        return df
+
+    return load_aggregate(datafile, [get_data_stem(location, 'water_level')],
+                          location, compute)
+
+def load_rollups(location, product, resolution='day', columns=None):
+    """
+    Returns the mean, minimum, maximum and count of `product` per hour, day,
+    month or year over the location's dates, read from the coarsest level
+    of the rollup pyramid that matches `resolution`. See
+    tides_pyramid.query_pyramid()
+    """
+    if not is_cached(get_data_stem(location, product)):
+        # downloads and cleans the data
+        load_noaa_tides_data_product(location, product, date_time_columns=False)
+
+    return query_pyramid(get_data_stem(location, product), location.start_date,
+                         location.end_date, resolution, columns)
+
+def fill_missing_months(df, location, product='water_level', min_coverage=MIN_MONTH_COVERAGE):
+    """
+    Puts monthly averages (see average_by_month()) on every month from the
+    station's first to last observation within the location's dates,
+    indexed by "YYYY-MM". Months without data, or with less than
+    `min_coverage` of their observations, are NaN. Uses the gap index, see
+    tides_gaps.GapIndex.coverage_by_month()
+    """
+    coverage = open_gap_index(location, product).coverage_by_month()
+
+    # the clean data can span more months than asked for, e.g. after an
+    # update or when the all time data is on disk
+    first = None if location.start_date is None else pd.Period(location.start_date, 'M')
+    last = None if location.end_date is None else pd.Period(location.end_date, 'M')
+    coverage = coverage.loc[first:last]
+
+    if 'Month' in df.columns:
+        df = df.set_index('Month')
+    df.index = df.index.astype(str)
+
+    df = df.reindex(coverage.index.strftime('%Y-%m'))
+    df.loc[(coverage['Coverage'] < min_coverage).to_numpy()] = np.nan
 
     return df
 
@@ -62,21 +155,23 @@ def average_by_month(location):
 def avg_temps_by_month(location):
     datafile = f"data/nooa_temps_avg_month_start_{format(parse_year(location.start_date))}_{location.station_id}.csv"
 
-    if isfile(datafile):
-        temps = pd.read_csv(datafile)
-    else:
-        watertemp = load_noaa_tides_data_product(location, 'water_temperature')
-        airtemp = load_noaa_tides_data_product(location, 'air_temperature')
-
+    def compute():
         # merges the 6-minute interval data for Water Temperatures and
-        # Air Temperatures
-        temps = watertemp.copy().join(airtemp[['Air Temp']].copy(), how='inner')
-
-        temps[['Year-Month', 'DoM']] = temps['Date'].str.rsplit('-', expand=True, n=1)
-        
-        temps = temps.groupby(by='Year-Month', as_index=False)[['Air Temp', 'Water Temp']].mean()
-
-        save_csv(temps, datafile, True)
+        # Air Temperatures, keeping the timestamps both products have
+        both = load_noaa_tides_data_products(location, ['water_temperature', 'air_temperature'],
+                                             how='inner')
+        temps = pd.DataFrame({'Air Temp': both['air_temperature', 'Air Temp'],
+                              'Water Temp': both['water_temperature', 'Water Temp']})
+
+        # monthly means of the merged rows, "YYYY-MM" labels for the graph
+        temps = temps.groupby(temps.index.values.astype('datetime64[M]')).mean()
+        temps.index = pd.DatetimeIndex(temps.index).strftime('%Y-%m')
+        temps.index.names = ['Year-Month']
+        return temps.reset_index()
+
+    temps = load_aggregate(datafile, [get_data_stem(location, 'water_temperature'),
+                                      get_data_stem(location, 'air_temperature')],
+                           location, compute)
 
     # print(temps)
     # print(list(temps.columns.values))
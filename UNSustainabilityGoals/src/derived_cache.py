@@ -0,0 +1,85 @@
+"""
+Cache for aggregates derived from the clean tides data, e.g. monthly
+averages.
+
+Each aggregate is saved as a csv with a `.json` sidecar recording the
+version of every clean data set it was computed from (see
+tides_cache.cache_version()) and the date range it covers:
+
+    data/noaa_water_level_avg_month_start_1996_8418150.csv
+    data/noaa_water_level_avg_month_start_1996_8418150.csv.json
+
+The aggregate is recomputed when any of those data sets has changed since,
+and the most recently used aggregates are also kept in memory for the rest
+of the run.
+
+DS5110 Fall 2023 Project Team 8 SDG
+"""
+
+import json
+import os
+import pandas as pd
+from helpers import save_csv, LRUCache
+from tides_cache import cache_version
+
+# aggregates kept in memory
+MAX_CACHED_AGGREGATES = 32
+_recent_aggregates = LRUCache(MAX_CACHED_AGGREGATES)
+
+def load_aggregate(datafile, sources, location, compute):
+    """
+    Returns the aggregate saved as `datafile`, computing it with `compute()`
+    if it is missing or any of its sources has changed since it was saved.
+
+    Parameters
+    ----------
+    datafile : str
+      csv the aggregate is saved as
+
+    sources : list of str
+      Clean data sets the aggregate is computed from, see
+      load_noaa_tides_data.get_data_stem()
+
+    location : Location
+      Station and date range of the aggregate
+
+    compute : callable
+      Takes no arguments and returns the aggregate as a DataFrame, saved with
+      its index
+    """
+    date_range = [location.start_date, location.end_date]
+    versions = {stem: cache_version(stem) for stem in sources}
+
+    key = (datafile, tuple(date_range), tuple(sorted(versions.items())))
+    df = _recent_aggregates.get(key)
+    if df is not None:
+        return df.copy()
+
+    if None not in versions.values() and os.path.isfile(datafile) \
+            and _read_meta(datafile) == {'sources': versions, 'date_range': date_range}:
+        df = pd.read_csv(datafile)
+    else:
+        print(f"Computing '{datafile}' from {sources}")
+        df = compute()
+
+        # compute() may have downloaded or migrated the sources
+        versions = {stem: cache_version(stem) for stem in sources}
+        key = (datafile, tuple(date_range), tuple(sorted(versions.items())))
+
+        save_csv(df, datafile, True)
+        _write_meta(datafile, {'sources': versions, 'date_range': date_range})
+
+    _recent_aggregates.put(key, df)
+
+    return df.copy()
+
+def _read_meta(datafile):
+    if not os.path.isfile(datafile + '.json'):
+        return None
+
+    with open(datafile + '.json') as f:
+        return json.load(f)
+
+def _write_meta(datafile, meta):
+    with open(datafile + '.json', 'w') as f:
+        json.dump(meta, f, indent=1)
@@ -0,0 +1,252 @@
+"""
+Resumable bulk download of NOAA Tides data.
+
+Each month (or year for 'hourly_height') of raw data is written to disk as
+soon as it arrives and recorded in a manifest, so a download that dies
+part way through picks up where it left off when it is run again:
+
+    raw_data/chunks/noaa_water_level_8410140/2015-03.csv
+    raw_data/chunks/noaa_water_level_8410140/manifest.json
+
+Manifest entries are keyed by station, product, year and month and record
+the status of the chunk, how many times it was attempted, its row count
+and the last error if there was one.
+
+A chunk the source has no data for isn't fetched again while the download
+resumes, but is checked again by the next download once the data has been
+assembled, see DownloadManager.clear().
+
+DS5110 Fall 2023 Project Team 8 SDG
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+import pandas as pd
+from chunk_assembler import ChunkAssembler
+from fetch_engine import fetch_in_order
+from helpers import save_csv
+
+CHUNK_DIR = 'raw_data/chunks'
+
+# chunk statuses in the manifest
+DONE = 'done'               # fetched, chunk file on disk
+NO_DATA = 'no_data'         # NOAA has no data for the chunk, not retried until cleared
+FAILED = 'failed'           # retried on the next run
+ASSEMBLED = 'assembled'     # included in clean data, chunk file removed
+
+class NoDataError(ValueError):
+    """
+    Raised by a fetch function when the source has no data for a chunk
+    """
+
+class DownloadError(RuntimeError):
+    """
+    Some chunks could not be fetched. Run the download again to retry them.
+    """
+
+class DownloadManager:
+    """
+    Downloads the chunks for one station and product with checkpoints.
+
+        manager = DownloadManager('water_level', '8410140')
+        df = manager.download(chunks, fetch)
+
+    Parameters
+    ----------
+    product : str
+      NOAA tides data product
+
+    station_id : str
+      NOAA tides station id
+
+    chunk_dir : str, optional
+      Parent directory for the chunk files and manifest
+    """
+
+    def __init__(self, product, station_id, chunk_dir=CHUNK_DIR):
+        self.product = product
+        self.station_id = station_id
+        self.directory = os.path.join(chunk_dir, f"noaa_{product}_{station_id}")
+        self.manifest_file = os.path.join(self.directory, 'manifest.json')
+        self._lock = threading.Lock()
+        self.manifest = self._load_manifest()
+
+    def chunk_key(self, chunk):
+        """
+        Returns the manifest key for a chunk: `station/product/year/month`,
+        or `station/product/year` for a chunk covering a whole year
+        """
+        year, month = _chunk_year_month(chunk)
+        key = f"{self.station_id}/{self.product}/{year}"
+
+        return key if month is None else f"{key}/{month}"
+
+    def chunk_file(self, chunk):
+        year, month = _chunk_year_month(chunk)
+        name = year if month is None else f"{year}-{month}"
+
+        return os.path.join(self.directory, f"{name}.csv")
+
+    def is_complete(self, chunk):
+        """
+        Returns True if the chunk doesn't need to be fetched again
+        """
+        entry = self.manifest.get(self.chunk_key(chunk))
+        if entry is None:
+            return False
+
+        if entry['status'] == NO_DATA:
+            return True
+
+        return entry['status'] == DONE and os.path.isfile(self.chunk_file(chunk))
+
+    def download(self, chunks, fetch, max_workers=None):
+        """
+        Fetches every chunk not already on disk, persisting each one as it
+        arrives, then returns all chunks assembled in order.
+
+        Parameters
+        ----------
+        chunks : list
+          `Location` objects in date order, see get_year_chunks()
+
+        fetch : callable
+          Takes a chunk and returns its DataFrame. Raises NoDataError if
+          there's no data for the chunk
+
+        Raises DownloadError if any chunk failed, rather than returning data
+        with the month missing. Chunks that did succeed stay on disk and are
+        skipped on the next run.
+        """
+        chunks = list(chunks)
+        pending = [chunk for chunk in chunks if not self.is_complete(chunk)]
+
+        print(f"'{self.product}' station {self.station_id}: {len(chunks) - len(pending)} "
+              f"of {len(chunks)} chunks already downloaded, fetching {len(pending)}")
+
+        # chunks are written to disk by the workers, nothing is kept here
+        for _ in fetch_in_order(pending, lambda chunk: self._fetch_chunk(chunk, fetch),
+                                max_workers=max_workers):
+            pass
+
+        failed = [self.chunk_key(chunk) for chunk in chunks
+                  if self.manifest[self.chunk_key(chunk)]['status'] == FAILED]
+        if failed:
+            raise DownloadError(f"{len(failed)} chunks failed for '{self.product}' station "
+                                f"{self.station_id}, see '{self.manifest_file}'. "
+                                f"Run again to retry them: {failed}")
+
+        return self.assemble(chunks)
+
+    def assemble(self, chunks):
+        """
+        Reads the downloaded chunk files back as one DataFrame in chunk order
+        """
+        assembler = ChunkAssembler()
+        for chunk in chunks:
+            if self.manifest[self.chunk_key(chunk)]['status'] == DONE:
+                assembler.add(pd.read_csv(self.chunk_file(chunk)))
+
+        return assembler.to_frame()
+
+    def clear(self):
+        """
+        Removes the chunk files once their data has been saved elsewhere.
+        The manifest is kept with the chunks marked as assembled. Chunks
+        without data are dropped from it, so the next download asks for
+        them again (e.g. a month that wasn't published yet)
+        """
+        if not self.manifest:
+            return
+
+        with self._lock:
+            for key in [key for key, entry in self.manifest.items()
+                        if entry['status'] == NO_DATA]:
+                del self.manifest[key]
+
+            for key, entry in self.manifest.items():
+                if entry['status'] == DONE:
+                    if entry['file'] and os.path.isfile(entry['file']):
+                        os.remove(entry['file'])
+                    entry['status'] = ASSEMBLED
+                    entry['file'] = None
+
+            self._save_manifest()
+
+    def _fetch_chunk(self, chunk, fetch):
+        """
+        Fetches one chunk, saves it and records the outcome. Runs on a worker
+        thread.
+        """
+        key = self.chunk_key(chunk)
+        year, month = _chunk_year_month(chunk)
+
+        with self._lock:
+            entry = self.manifest.setdefault(key, {
+                'station_id': self.station_id,
+                'product': self.product,
+                'year': year,
+                'month': month,
+                'attempts': 0
+            })
+            entry['attempts'] += 1
+
+        status, rows, error, data_file = FAILED, 0, None, None
+        try:
+            df = fetch(chunk)
+            _save_atomic(df, self.chunk_file(chunk))
+            status, rows, data_file = DONE, len(df), self.chunk_file(chunk)
+        except NoDataError as e:
+            status, error = NO_DATA, str(e)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"Failed to fetch {key}: {error}")
+
+        with self._lock:
+            entry.update({
+                'start_date': chunk.start_date,
+                'end_date': chunk.end_date,
+                'status': status,
+                'rows': rows,
+                'file': data_file,
+                'error': error,
+                'updated': datetime.now().isoformat(timespec='seconds')
+            })
+            self._save_manifest()
+
+    def _load_manifest(self):
+        if not os.path.isfile(self.manifest_file):
+            return {}
+
+        with open(self.manifest_file) as f:
+            return json.load(f)
+
+    def _save_manifest(self):
+        # caller holds self._lock
+        os.makedirs(self.directory, exist_ok=True)
+        temp_file = self.manifest_file + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(temp_file, self.manifest_file)
+
+def _chunk_year_month(chunk):
+    """
+    Returns (year, month) as strings for a chunk, month is None for a
+    chunk spanning more than one month
+    """
+    year = chunk.start_date[:4]
+    month = chunk.start_date[4:6] if chunk.start_date[:6] == chunk.end_date[:6] else None
+
+    return year, month
+
+def _save_atomic(df, filename):
+    """
+    Writes the csv under a temporary name first so an interrupted write
+    never leaves a truncated chunk behind
+    """
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    temp_file = filename + '.tmp'
+    save_csv(df, temp_file)
+    os.replace(temp_file, filename)
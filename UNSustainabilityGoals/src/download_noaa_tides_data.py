@@ -15,36 +15,23 @@ Ryan Moore <moore.will@northeastern.edu>
 """
 
 import argparse
+import fetch_engine
+from download_scheduler import DownloadJob, run_jobs
 from load_noaa_tides_data import load_noaa_tides_data_product_raw, \
     load_noaa_tides_data_product
 from location_class import Location
 
-# downloads all time data for all products or single specified product
-# for the station specified
-def download_data_product(product, location, data_format):
-    if product in products:
-        print(f"downloading data for '{product}' for station {location.station_id} {location.get_station_name()}")
-        
-        save_by_data_format(location, product, data_format)
-    elif product == 'all':
-        print(f"downloading all data products for station {location.station_id} {location.get_station_name()}")
-
-        # download each data product individually
-        for p in products:
-            temp_loc = Location(location.start_date, location.end_date, location.station_id)
-            save_by_data_format(temp_loc, p, data_format)
-    else:
-        print(f"unsupported product: '{product}'. not downloading")
-
-# saves raw, clean or both
-def save_by_data_format(location, product, data_format):
+# saves raw, clean or both. With update, clean data already on disk is
+# only topped up with the months after its newest timestamp
+def save_by_data_format(location, product, data_format, update=False):
     # save raw data first, saving clean data will use the raw file if available
     if data_format in ['raw', 'all']:
         print(f"saving raw {product} data for {location.get_station_name()} {location}")
         load_noaa_tides_data_product_raw(location, product, use_all_time_data=True, save_raw_data=True)
     if data_format in ['clean', 'all']:
         print(f"saving clean {product} data for {location.get_station_name()} {location}")
-        load_noaa_tides_data_product(location, product, use_all_time_data=True)
+        load_noaa_tides_data_product(location, product, use_all_time_data=True,
+                                     date_time_columns=False, update=update)
 
 products = ['hourly_height', 'water_level', 
                     'air_temperature', 'water_temperature']
@@ -62,6 +49,9 @@ print(f"station_id choices: {station_id_choices}")
 
 data_formats = ['clean', 'raw', 'all']
 
+# requests per second to the NOAA webservice, across all jobs
+DEFAULT_RATE = fetch_engine.DEFAULT_REQUESTS_PER_SECOND
+
 parser = argparse.ArgumentParser()
 parser.add_argument("product", help="enter NOAA tides data product to download",
                     choices=product_choices)
@@ -69,6 +59,13 @@ parser.add_argument("station_id", help="enter station_id for NOAA tides data to
                     choices=station_id_choices)
 parser.add_argument("data_format", help="enter station_id for NOAA tides data to download",
                     choices=data_formats)
+parser.add_argument("--update", action="store_true",
+                    help="fetch only data newer than the clean data already on disk")
+parser.add_argument("--jobs", type=int, default=1,
+                    help="number of station/product downloads to run at once")
+parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                    help="maximum requests per second to the NOAA webservice across all jobs "
+                         f"(default {DEFAULT_RATE})")
 
 args = parser.parse_args()
 
@@ -81,15 +78,28 @@ else:
 
 data_format = args.data_format.lower()
 
-# download the data product(s) for all known stations
-# or for singular input station. Does not specify dates,
+# one job per station and product. Does not specify dates,
 # this forces the data pull to get all available data based on
 # mapping in location_class
-if station_id == 'all':
-    for id in station_ids:
-        location = Location(None, None, id)
-        download_data_product(product, location, data_format)
-else:
-    location = Location(None, None, station_id)
-    download_data_product(product, location, data_format)
+def make_jobs(product, station_id):
+    job_station_ids = station_ids if station_id == 'all' else [station_id]
+    job_products = products if product == 'all' else [product]
+
+    return [DownloadJob(id, p) for id in job_station_ids for p in job_products]
+
+def run_job(job):
+    location = Location(None, None, job.station_id)
+    print(f"downloading data for '{job.product}' for station {location.station_id} {location.get_station_name()}")
+
+    save_by_data_format(location, job.product, data_format, args.update)
+
+# jobs run as threads of this process, so they share the per-host cap and
+# the rate limit: more jobs only keep the same slots busy
+fetch_engine.set_rate_limit(args.rate)
+
+jobs = make_jobs(product, station_id)
+print(f"downloading {len(jobs)} station/product combinations, {args.jobs} at a time")
 
+failed = run_jobs(jobs, run_job, max_jobs=args.jobs)
+if failed:
+    raise SystemExit(1)
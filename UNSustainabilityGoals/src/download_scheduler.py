@@ -0,0 +1,86 @@
+"""
+Runs independent download jobs (one per station and data product) in
+parallel and reports progress with an estimated time remaining.
+
+Jobs run on threads: the work is waiting on the NOAA webservice, and
+threads share the per-host request cap and global rate limit in
+fetch_engine.py, so the total load on the API stays bounded however many
+jobs run at once.
+
+DS5110 Fall 2023 Project Team 8 SDG
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+class DownloadJob:
+    def __init__(self, station_id, product):
+        self.station_id = station_id
+        self.product = product
+        self.duration = None
+        self.error = None
+
+    def __str__(self):
+        return f"'{self.product}' for station {self.station_id}"
+
+def run_jobs(jobs, run, max_jobs=1):
+    """
+    Calls `run(job)` for every job, at most `max_jobs` at a time, printing a
+    progress line with an ETA as each job finishes.
+
+    A failing job doesn't stop the others, its error is kept on the job and
+    listed in the summary.
+
+    Returns the jobs that failed.
+    """
+    jobs = list(jobs)
+    start_time = datetime.now()
+
+    def timed_run(job):
+        job_start = datetime.now()
+        try:
+            run(job)
+        except Exception as e:
+            job.error = e
+        job.duration = datetime.now() - job_start
+
+        return job
+
+    finished = 0
+    with ThreadPoolExecutor(max_workers=max(1, max_jobs)) as pool:
+        futures = [pool.submit(timed_run, job) for job in jobs]
+
+        for future in as_completed(futures):
+            job = future.result()
+            finished += 1
+            print_progress(job, finished, len(jobs), datetime.now() - start_time)
+
+    failed = [job for job in jobs if job.error is not None]
+    print_summary(jobs, failed, datetime.now() - start_time)
+
+    return failed
+
+def estimate_remaining(elapsed, finished, total):
+    """
+    Estimates time left from the average time per finished job so far.
+    Jobs run in parallel, so this is wall time, not summed job time.
+    """
+    if finished == 0:
+        return None
+
+    return timedelta(seconds=round(elapsed.total_seconds() / finished * (total - finished)))
+
+def print_progress(job, finished, total, elapsed):
+    status = "failed" if job.error is not None else "done"
+    print(f"[{finished}/{total}] {status} {job} in {_round(job.duration)}, "
+          f"elapsed {_round(elapsed)}, ETA {estimate_remaining(elapsed, finished, total)}")
+
+def print_summary(jobs, failed, elapsed):
+    print(f"Finished {len(jobs) - len(failed)} of {len(jobs)} downloads in {_round(elapsed)}")
+
+    for job in failed:
+        print(f"  FAILED {job}: {type(job.error).__name__}: {job.error}")
+
+def _round(duration):
+    # whole seconds are enough for progress output
+    return timedelta(seconds=round(duration.total_seconds()))
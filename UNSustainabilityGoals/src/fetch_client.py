@@ -0,0 +1,303 @@
+"""
+HTTP client for the NOAA Tides webservice and the NCEI storm events files.
+
+* keeps one pooled keep-alive `requests.Session` per thread, so repeated
+  requests to the same host reuse their connection
+* asks for gzip compressed responses
+* retries failed requests with exponential backoff, successful requests
+  return immediately
+* revalidates cached responses with ETag / Last-Modified, a `304 Not
+  Modified` reply is served from the cache without downloading the body
+  again
+* streams large files straight to disk, see FetchClient.download()
+
+DS5110 Fall 2023 Project Team 8 SDG
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+import requests
+from requests.adapters import HTTPAdapter
+from fetch_engine import host_slot, wait_for_rate_limit, MAX_WORKERS
+
+# where responses with ETag or Last-Modified headers are kept for
+# revalidation. Responses without either header are never cached.
+HTTP_CACHE_DIR = os.environ.get('FETCH_CACHE_DIR', 'raw_data/http_cache')
+
+# total size of the cached bodies, the least recently used entries are
+# removed beyond it
+HTTP_CACHE_MAX_BYTES = int(os.environ.get('FETCH_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# identifies our requests in NOAA's logs, same as the 'application' query
+# parameter
+USER_AGENT = 'DS5110_Fall2023_ProjectTeam8'
+
+# bytes read from the network at a time by FetchClient.download()
+DOWNLOAD_BLOCK_SIZE = 1024 * 1024
+
+class FetchClient:
+    """
+    Pooled HTTP client. Safe to share between threads.
+
+        client = get_client()
+        text = client.get_text(url)
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+      Directory for revalidation cache entries. `None` disables the cache.
+
+    cache_max_bytes : int, optional
+      Size the cached bodies are kept under, least recently used first out
+
+    max_attempts : int, optional
+      Number of tries per request before giving up
+
+    backoff : float, optional
+      Seconds to wait after the first failure, doubled after each further
+      failure
+    """
+
+    def __init__(self, cache_dir=HTTP_CACHE_DIR, max_attempts=3, backoff=1.0,
+                 timeout=60, cache_max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self._cache_lock = threading.Lock()
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.timeout = timeout
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        """
+        The calling thread's session. requests.Session isn't guaranteed to
+        be thread-safe, so each worker thread gets its own connection pool.
+        """
+        if not hasattr(self._local, 'session'):
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({
+                'Accept-Encoding': 'gzip, deflate',
+                'Connection': 'keep-alive',
+                'User-Agent': USER_AGENT
+            })
+            self._local.session = session
+
+        return self._local.session
+
+    def get(self, url):
+        """
+        Returns the response body of a GET request as bytes. Raises the last
+        error if every attempt fails.
+        """
+        cached = self._read_cache(url)
+
+        headers = {}
+        if cached is not None:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        response = self.request(url, headers=headers)
+
+        if response.status_code == 304 and cached is not None:
+            return cached['body']
+
+        self._write_cache(url, response)
+
+        return response.content
+
+    def get_text(self, url):
+        """
+        Returns the response body of a GET request decoded as text
+        """
+        return self.get(url).decode('utf-8')
+
+    def head(self, url):
+        """
+        Returns the response headers for `url` without downloading the body,
+        e.g. to compare `Content-Length` and `Last-Modified` with a local copy
+        """
+        return self.request(url, method='HEAD').headers
+
+    def download(self, url, filename, decompress=False):
+        """
+        Streams the response body of a GET request straight to `filename`
+        without holding it in memory. The file is written under a temporary
+        name and only replaces `filename` once complete.
+
+        Parameters
+        ----------
+        decompress : bool, optional
+          Gunzip the body while writing it, for `.gz` files
+
+        Returns the response headers.
+        """
+        response = self.request(url, stream=True)
+
+        try:
+            os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+            temp_file = filename + '.tmp'
+            # gzip member, see zlib.decompressobj
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if decompress else None
+
+            with open(temp_file, 'wb') as f:
+                for block in response.iter_content(chunk_size=DOWNLOAD_BLOCK_SIZE):
+                    f.write(decompressor.decompress(block) if decompressor else block)
+                if decompressor:
+                    f.write(decompressor.flush())
+
+            os.replace(temp_file, filename)
+        finally:
+            response.close()
+
+        return response.headers
+
+    def request(self, url, headers=None, stream=False, method='GET'):
+        """
+        Sends a GET (or `method`) request, retrying with exponential backoff on connection
+        errors and 5xx / 429 responses. Returns the `requests.Response`.
+
+        Every attempt waits for a free slot for the host and for the global
+        rate limit, see fetch_engine.py
+        """
+        delay = self.backoff
+
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                with host_slot(url):
+                    wait_for_rate_limit()
+                    response = self.session.request(method, url, headers=headers,
+                                                    timeout=self.timeout, stream=stream)
+                    if not stream:
+                        # read the body while the host slot is held
+                        response.content
+
+                if response.status_code < 500 and response.status_code != 429:
+                    response.raise_for_status()
+                    return response
+
+                error = requests.HTTPError(
+                    f"{response.status_code} {response.reason} for url: {url}",
+                    response=response)
+            except requests.RequestException as e:
+                if isinstance(e, requests.HTTPError):
+                    # 4xx other than 429 won't succeed on a retry
+                    raise
+
+                error = e
+
+            if attempt < self.max_attempts:
+                print(f"Request failed on attempt {attempt}, retrying in {delay}s: {error}")
+                time.sleep(delay)
+                delay *= 2
+
+        raise error
+
+    def _cache_file(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key)
+
+    def _read_cache(self, url):
+        if self.cache_dir is None:
+            return None
+
+        cache_file = self._cache_file(url)
+        try:
+            with open(cache_file + '.json') as f:
+                entry = json.load(f)
+            with open(cache_file + '.body', 'rb') as f:
+                entry['body'] = f.read()
+        except (OSError, ValueError):
+            return None
+
+        # a body that doesn't match its entry, e.g. from another write in
+        # between, is never served
+        if entry.get('sha1') != hashlib.sha1(entry['body']).hexdigest():
+            return None
+
+        # most recently used entries are evicted last
+        os.utime(cache_file + '.json')
+
+        return entry
+
+    def _write_cache(self, url, response):
+        if self.cache_dir is None:
+            return
+
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+
+        body = response.content
+        if len(body) > self.cache_max_bytes:
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cache_file = self._cache_file(url)
+        entry = {'url': url, 'etag': etag, 'last_modified': last_modified,
+                 'size': len(body), 'sha1': hashlib.sha1(body).hexdigest()}
+
+        # written under temporary names so an interrupted write never
+        # leaves a truncated entry behind
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(cache_file + '.body' + suffix, 'wb') as f:
+            f.write(body)
+        os.replace(cache_file + '.body' + suffix, cache_file + '.body')
+        with open(cache_file + '.json' + suffix, 'w') as f:
+            json.dump(entry, f)
+        os.replace(cache_file + '.json' + suffix, cache_file + '.json')
+
+        self._evict()
+
+    def _evict(self):
+        """
+        Removes the least recently used entries until the cached bodies fit
+        in `cache_max_bytes`
+        """
+        with self._cache_lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith('.json'):
+                    continue
+                cache_file = os.path.join(self.cache_dir, name[:-len('.json')])
+                try:
+                    entries.append((os.path.getmtime(cache_file + '.json'),
+                                    os.path.getsize(cache_file + '.body'), cache_file))
+                except OSError:
+                    continue
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, cache_file in sorted(entries):
+                if total <= self.cache_max_bytes:
+                    break
+                for extension in ('.json', '.body'):
+                    try:
+                        os.remove(cache_file + extension)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """
+    Returns the shared FetchClient for this process
+    """
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = FetchClient()
+
+        return _client
@@ -0,0 +1,158 @@
+"""
+Concurrent fetch engine for NOAA Tides data chunks.
+
+The NOAA Tides webservice limits 6-minute interval products to one month
+of data per request, so pulling a station's history means hundreds of
+small requests. The engine issues those requests from a bounded thread
+pool and hands the results back in the order the chunks were given so
+callers can reassemble them by date.
+
+DS5110 Fall 2023 Project Team 8 SDG
+"""
+
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# number of simultaneous requests allowed to any one host. Kept small to
+# stay polite to the NOAA webservice
+MAX_REQUESTS_PER_HOST = 4
+
+# number of worker threads used to fetch chunks
+MAX_WORKERS = 8
+
+# global cap on requests per second across all threads, None for no limit.
+# See set_rate_limit()
+MAX_REQUESTS_PER_SECOND = None
+
+# rate bulk downloads use unless told otherwise, see
+# download_noaa_tides_data.py and station_batch.download_missing()
+DEFAULT_REQUESTS_PER_SECOND = 5
+
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+def set_max_requests_per_host(limit):
+    """
+    Changes the per-host concurrency cap. Only affects hosts that have
+    not been contacted yet in this process.
+    """
+    global MAX_REQUESTS_PER_HOST
+
+    if limit < 1:
+        raise ValueError(f"max requests per host must be at least 1, got {limit}")
+
+    MAX_REQUESTS_PER_HOST = limit
+    with _host_semaphores_lock:
+        _host_semaphores.clear()
+
+def _get_host_semaphore(url):
+    """
+    Returns the semaphore guarding requests to the host of `url`
+    """
+    host = urllib.parse.urlsplit(url).netloc
+
+    with _host_semaphores_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(MAX_REQUESTS_PER_HOST)
+
+        return _host_semaphores[host]
+
+@contextmanager
+def host_slot(url):
+    """
+    Blocks until a request slot for the host of `url` is free. Use around
+    the network call itself so the cap holds no matter how many threads
+    are fetching.
+
+        with host_slot(query_url):
+            df = pd.read_csv(query_url)
+    """
+    semaphore = _get_host_semaphore(url)
+    semaphore.acquire()
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+class RateLimiter:
+    """
+    Spaces requests evenly so no more than `rate` start per second, no
+    matter how many threads are making them
+    """
+
+    def __init__(self, rate=None):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        """
+        Blocks until the calling thread may send its request
+        """
+        if not self.rate:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1 / self.rate
+
+        if slot > now:
+            time.sleep(slot - now)
+
+_rate_limiter = RateLimiter(MAX_REQUESTS_PER_SECOND)
+
+def set_rate_limit(rate):
+    """
+    Sets the global requests per second cap. `None` removes the limit.
+    """
+    global MAX_REQUESTS_PER_SECOND
+
+    if rate is not None and rate <= 0:
+        raise ValueError(f"rate limit must be positive, got {rate}")
+
+    MAX_REQUESTS_PER_SECOND = rate
+    _rate_limiter.rate = rate
+
+def wait_for_rate_limit():
+    """
+    Blocks until the global rate limit allows another request
+    """
+    _rate_limiter.wait()
+
+def fetch_in_order(chunks, fetch, max_workers=None):
+    """
+    Calls `fetch(chunk)` for every chunk using a thread pool and yields the
+    results in the same order as `chunks`. Results are handed over as soon
+    as they and all the chunks before them are done, so the caller can
+    consume them without holding every chunk in memory at once.
+
+    Parameters
+    ----------
+    chunks : iterable
+      Work items, e.g. `Location` objects covering one month each
+
+    fetch : callable
+      Function taking one chunk and returning its data
+
+    max_workers : int, optional
+      Number of worker threads, defaults to `MAX_WORKERS`
+    """
+    chunks = list(chunks)
+
+    if max_workers is None:
+        max_workers = MAX_WORKERS
+
+    # nothing to gain from threads for a single request
+    if len(chunks) <= 1 or max_workers <= 1:
+        for chunk in chunks:
+            yield fetch(chunk)
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+        # map() yields results in submission order regardless of which
+        # request finishes first
+        yield from pool.map(fetch, chunks)
@@ -1,72 +1,107 @@
+import json
 import os
-import requests
-import pandas as pd
+import re
+import threading
+from fetch_client import get_client
+from fetch_engine import fetch_in_order
+from storm_helpers import stream_storm_details, write_storm_partition, \
+    remove_storm_partition, storm_partition_file
 
-def get_storms(output_directory):
-    # URL of the directory containing the .csv files
-    base_url = "https://www.ncei.noaa.gov/pub/data/swdi/stormevents/csvfiles"
+# URL of the directory containing the .csv files. Can be pointed at a
+# local mirror
+STORM_EVENTS_URL = os.environ.get('NCEI_STORM_EVENTS_URL',
+                                  "https://www.ncei.noaa.gov/pub/data/swdi/stormevents/csvfiles")
+
+# downloaded 'details' files are kept here, unzipped, so unchanged years
+# aren't downloaded again
+STORM_DETAILS_DIR = 'raw_data/storm_details'
+
+def get_storms(output_directory=STORM_DETAILS_DIR):
     if not os.path.exists(output_directory):
         os.makedirs(output_directory)
 
-    # Define data types for columns with mixed types
-    column_data_types = {
-        25: str,
-        26: str,
-        28: str,
-        29: str,
-        34: str,
-        35: str,
-        37: str,
-        40: str,
-        42: str,
-        43: str,
-        48: str,
-        49: str,
-    }
-
-    # Function to download a file and save it to the output_directory
-    def download_file(url, filename):
-        response = requests.get(url)
-        if response.status_code == 200:
-            with open(os.path.join(output_directory, filename), 'wb') as file:
-                file.write(response.content)
+    # pooled keep-alive session with retries, shared with the tides loader
+    client = get_client()
+
+    # upstream size and last modified time of every file downloaded so far
+    manifest_file = os.path.join(output_directory, 'manifest.json')
+    manifest = {}
+    if os.path.isfile(manifest_file):
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+    manifest_lock = threading.Lock()
+
+    # saved after every download, so a run that fails part way through
+    # doesn't download the files it already got again
+    def save_manifest():
+        with manifest_lock:
+            with open(manifest_file + '.tmp', 'w') as f:
+                json.dump(manifest, f, indent=1, sort_keys=True)
+            os.replace(manifest_file + '.tmp', manifest_file)
+
+    # Function to download a file unless the local copy is up to date, then
+    # rebuild that year's partition of coastal maine wind events.
+    # Returns True if the file was downloaded
+    def download_file(url):
+        name = url.split("/")[-1]
+        filename = os.path.join(output_directory, name.removesuffix('.gz'))
+        year = details_year(name)
+
+        headers = client.head(url)
+        remote = {'size': headers.get('Content-Length'),
+                  'last_modified': headers.get('Last-Modified')}
+
+        entry = manifest.get(name)
+        if entry is not None and os.path.isfile(filename) \
+                and entry['size'] == remote['size'] \
+                and entry['last_modified'] == remote['last_modified']:
+            if not os.path.isfile(storm_partition_file(year)):
+                write_storm_partition(stream_storm_details(filename), year)
+            return False
+
+        client.download(url, filename, decompress=name.endswith('.gz'))
+        print(f"Downloaded: {name}")
+
+        # only this year's partition is rewritten
+        write_storm_partition(stream_storm_details(filename), year)
+
+        with manifest_lock:
+            manifest[name] = dict(remote, file=filename)
+        save_manifest()
+
+        return True
 
     # Get a list of all .csv files in the directory
-    response = requests.get(base_url)
-    if response.status_code == 200:
-        file_links = [base_url + "/" + line.split('href="')[1].split('"')[0] for line in response.text.split('\n') if ".csv" in line]
-
-        # Download .csv files with 'details' in the title and save them as separate .csv files
-        for link in file_links:
-            filename = link.split("/")[-1]
-            if 'details' in filename:
-                download_file(link, filename)
-                print(f"Downloaded: {filename}")
-
-    # Merge the downloaded 'details' files into one .csv file titled 'details_combined'
-    all_data = []
-    for root, dirs, files in os.walk(output_directory):
-        for file in files:
-            if 'details' in file:
-                file_path = os.path.join(root, file)
-                df = pd.read_csv(file_path, dtype=column_data_types)  # Specify data types
-                all_data.append(df)
-
-    if all_data:
-        combined_details = pd.concat(all_data, ignore_index=True)
-        combined_details.to_csv(os.path.join(output_directory, 'raw_storm_df.csv'), index=False)
-        print("All 'details' files merged into 'raw_storm_df.csv' at the specified path.")
-
-        # Delete the individual 'details' files
-        for root, dirs, files in os.walk(output_directory):
-            for file in files:
-                if 'details' in file:
-                    file_path = os.path.join(root, file)
-                    os.remove(file_path)
-                    print(f"Deleted: {file}")
-
-    else:
-        print("No 'details' files found for merging.")
-
-    
-get_storms('data')
\ No newline at end of file
+    listing = client.get_text(STORM_EVENTS_URL)
+    file_links = [STORM_EVENTS_URL + "/" + line.split('href="')[1].split('"')[0]
+                  for line in listing.split('\n') if ".csv" in line and 'href="' in line]
+
+    # Download .csv files with 'details' in the title concurrently
+    details_links = [link for link in file_links if 'details' in link.split("/")[-1]]
+    downloaded = sum(fetch_in_order(details_links, download_file))
+
+    # NCEI replaces a year's file with one of a newer creation date, drop
+    # the copies no longer listed
+    listed = {link.split("/")[-1] for link in details_links}
+    listed_years = {details_year(name) for name in listed}
+    for name in [name for name in manifest if name not in listed]:
+        if os.path.isfile(manifest[name]['file']):
+            os.remove(manifest[name]['file'])
+        if details_year(name) not in listed_years:
+            remove_storm_partition(details_year(name))
+        del manifest[name]
+        print(f"Deleted: {name}")
+
+    save_manifest()
+
+    print(f"{downloaded} of {len(details_links)} 'details' files downloaded, "
+          f"{len(details_links) - downloaded} already up to date")
+
+def details_year(name):
+    """
+    Returns the year of a details file from its name, e.g. 1950 for
+    'StormEvents_details-ftp_v1.0_d1950_c20210803.csv.gz'
+    """
+    return int(re.search(r'_d(\d{4})_', name).group(1))
+
+get_storms()
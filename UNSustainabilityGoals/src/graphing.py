@@ -11,7 +11,7 @@ Johnathan Green <green.john@northeastern.edu>
 Ryan Moore <moore.will@northeastern.edu>
 """
 
-from load_noaa_tides_data import load_noaa_tides_data_product, split_date_time_col
+from load_noaa_tides_data import load_noaa_tides_data_product
 from data_editing import findDifference
 from helpers import save_or_display_graph
 import matplotlib.pyplot as plt
@@ -34,8 +34,9 @@ def graph_week(location, figname=None):
       Filename to save graph as. If not specified, graph will display instead of save.
     """
     plt.clf()
-    # fetch data from NOAA web service
-    data = load_noaa_tides_data_product(location)
+    # reads only the months the week falls in, hourly data as is
+    data = load_noaa_tides_data_product(location, 'hourly_height',
+                                        date_time_columns=['Date Time'])
 
     # plot the data
     line = sns.lineplot(data, x="Date Time", y="Water Level", legend="brief", label="Actual")
@@ -11,6 +11,8 @@ Johnathan Green <green.john@northeastern.edu>
 Ryan Moore <moore.will@northeastern.edu>
 """
 
+import threading
+from collections import OrderedDict
 from datetime import datetime
 
 def save_csv(df, filename, save_index=False):
@@ -20,6 +22,40 @@ def save_csv(df, filename, save_index=False):
 
     df.to_csv(filename, index=save_index)
 
+class LRUCache:
+    """
+    Keeps the `maxsize` most recently used values in memory
+
+        cache = LRUCache(4)
+        cache.put(key, df)
+        df = cache.get(key)     # None if not cached
+    """
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
 def parse_year(date_str):
     """
     Parse year from string in format "20230501"
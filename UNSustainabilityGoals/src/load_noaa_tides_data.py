@@ -1,7 +1,7 @@
 """
 Loads NOAA tides data to Pandas DataFrames.
-Creates a local copy of cleaned up data as
-csv if not already on disk.
+Creates a local copy of cleaned up data
+if not already on disk. See tides_cache.py
 
 DS5110 Fall 2023 Project Team 8 SDG
 
@@ -14,15 +14,30 @@ Ryan Moore <moore.will@northeastern.edu>
 
 """
 
+import io
 import os
 import urllib.parse
+import numpy as np
 import pandas as pd
-import time
 from location_class import Location
 from datetime import datetime
 from helpers import parse_year, save_csv, calc_last_day_of_month
-
-def load_noaa_tides_data_product(location=None, product='hourly_height', use_all_time_data=False):
+from fetch_engine import fetch_in_order
+from fetch_client import get_client
+from chunk_assembler import ChunkAssembler
+from download_manager import DownloadManager, NoDataError
+from tides_gaps import update_gap_index
+from tides_cache import is_cached, read_clean_data, write_clean_data, \
+    to_typed_frame, cache_path, parse_date_time, last_cached_timestamp, \
+    append_clean_data, to_scaled_int16
+
+# NOAA CO-OPS data retrieval API. Can be pointed at a local stand-in server
+# by setting the NOAA_TIDES_API_URL environment variable
+NOAA_API_URL = os.environ.get('NOAA_TIDES_API_URL',
+                              'https://api.tidesandcurrents.noaa.gov/api/prod/datagetter')
+
+def load_noaa_tides_data_product(location=None, product='hourly_height', use_all_time_data=False,
+                                 date_time_columns=True, update=False, compact=False):
     """
     Loads the specified NOAA tides data product for the Portland, ME station as a Pandas DataFrame.
     Data is cleaned up after loading. Cleaned data is saved to disk.
@@ -47,6 +62,24 @@ def load_noaa_tides_data_product(location=None, product='hourly_height', use_all
       Specifies if the data for all time should be used to create the data set.
       If set to `True`, this may result in long load times if the data has not been
       downloaded ahead of time with `download_noaa_tides_data.py`
+
+    date_time_columns : bool or list, optional
+      The returned DataFrame always has a datetime "Date Time" index.
+      `True` (default) also adds the "Date Time", "Date" and "Time" string
+      columns, a list adds only the named ones, `False` adds none. Building
+      the strings is the most expensive part of a load, skip them when the
+      index is enough.
+
+    update : bool, optional
+      Fetch the months after the newest cached timestamp and merge them into
+      the clean data before loading. See update_clean_data()
+
+    compact : bool or str, optional
+      `True` returns only the datetime index and float32 measurements, with
+      no string columns whatever `date_time_columns` says. `int16` also
+      stores the measurements as int16 scaled per column, about half the
+      memory of float32, see tides_cache.to_scaled_int16(). Use
+      add_date_time_columns() to build the strings later if needed.
     
     Data range
     ----------
@@ -64,10 +97,10 @@ def load_noaa_tides_data_product(location=None, product='hourly_height', use_all
     input_start_date = location.start_date
     input_end_date = location.end_date
     print(f"location: {location}")
-    data_file = f"data/noaa_{product}_{location.station_id}_clean.csv"
+    data_stem = get_data_stem(location, product, use_all_time_data)
 
-    if os.path.isfile(data_file):
-        print("Found file for '{}' clean data for all time for station {} {}. "
+    if is_cached(data_stem):
+        print("Found file for '{}' clean data for station {} {}. "
               "Loading data for dates {} to {}".format(
                   product, location.station_id, location.get_station_name(),
                   location.start_date, location.end_date))
@@ -80,11 +113,18 @@ def load_noaa_tides_data_product(location=None, product='hourly_height', use_all
         print("Loading '{}' clean data for station {} {} for dates {} "
           "to {}".format(product, location.station_id, location.get_station_name(),
           location.start_date, location.end_date))
-        data_file = f"data/noaa_{product}_start_{parse_year(location.start_date)}_{location.station_id}_clean.csv"
+
+    # fetch only what's new since the last download
+    if update and is_cached(data_stem):
+        update_clean_data(data_stem, product, location.station_id)
+
+    # typed data: datetime index, float32 measurements. Only the months
+    # overlapping the requested dates are read from disk
+    df = read_clean_data(data_stem, input_start_date, input_end_date)
 
     # save the cleaned up data set if necessary
-    if not os.path.isfile(data_file):
-        print(f"Clean data file for product '{product}' not found, writing as '{data_file}'")
+    if df is None:
+        print(f"Clean data file for product '{product}' not found, writing as '{cache_path(data_stem)}'")
         df = load_noaa_tides_data_product_raw(location, product, use_all_time_data)
 
         # print(f"before make_tides_data_tidy df:\n{df}")
@@ -93,18 +133,12 @@ def load_noaa_tides_data_product(location=None, product='hourly_height', use_all
         # print(f"after make_tides_data_tidy df:\n{df}")
 
         # save the cleaned up data to disk
-        save_csv(df, data_file)
-    else:
-        df = pd.read_csv(data_file)
-
-    # Split "Date Time" to two columns "Date" and "Time". Original Date Time
-    # remains in dataset.
-    df = split_date_time_col(df)
-
-    # set the date & time as the index
-    set_datetime_index(df)
-    # print(f"Date index: {df.index}")
+        df = to_typed_frame(df)
+        write_clean_data(df, data_stem)
+        update_gap_index(data_stem, product)
 
+        # the downloaded raw chunks are no longer needed
+        DownloadManager(product, location.station_id).clear()
 
     # get data by input date range. Reset the location's date gets
     # since it gets modified by the data pull
@@ -115,9 +149,72 @@ def load_noaa_tides_data_product(location=None, product='hourly_height', use_all
     df = select_by_dates(df, location)
     # print(f"after select_by_dates df:\n{df}")
 
+    # "Date Time", "Date" and "Time" string columns are only built when the
+    # caller asks for them, and only for the selected rows
+    if compact == 'int16':
+        df = to_scaled_int16(df)
+    elif date_time_columns and not compact:
+        df = add_date_time_columns(df, date_time_columns)
+
     print(f"load_noaa_tides_data_product() df:\n{df}")
     return df
 
+def get_data_stem(location, product, use_all_time_data=False):
+    """
+    Returns the clean data set load_noaa_tides_data_product() reads for
+    `location` and `product`: the all time data if it's on disk or
+    requested, otherwise the data starting at the location's start year
+    """
+    data_stem = f"data/noaa_{product}_{location.station_id}_clean"
+
+    if is_cached(data_stem) or use_all_time_data:
+        return data_stem
+
+    return f"data/noaa_{product}_start_{parse_year(location.start_date)}_{location.station_id}_clean"
+
+def update_clean_data(data_stem, product, station_id, end_date=None):
+    """
+    Brings cached clean data up to date by fetching only the months from
+    the newest cached timestamp onwards. The boundary month is fetched
+    again in full and de-duplicated against the cache, so a month that
+    was partially downloaded (or still preliminary) is completed.
+
+    Parameters
+    ----------
+    data_stem : str
+      Cached data set, see tides_cache.read_clean_data()
+
+    end_date : str, optional
+      Last date to fetch in format `YYYYMMDD`, defaults to today
+
+    Returns the number of new rows added
+    """
+    last_timestamp = last_cached_timestamp(data_stem)
+    if last_timestamp is None:
+        return 0
+
+    if end_date is None:
+        end_date = datetime.now().strftime("%Y%m%d")
+
+    start_date = last_timestamp.strftime("%Y%m%d")
+    print(f"Updating '{product}' data for station {station_id} from {start_date} to {end_date}")
+
+    chunks = get_chunks_between(start_date, end_date, product, station_id)
+    df = get_chunks_data(chunks, product)
+
+    if df.empty:
+        print(f"No new '{product}' data for station {station_id}")
+        return 0
+
+    df = to_typed_frame(make_tides_data_tidy(df, product))
+    new_rows = int((df.index > last_timestamp).sum())
+
+    append_clean_data(df, data_stem)
+    update_gap_index(data_stem, product)
+    print(f"Added {new_rows} new rows of '{product}' data for station {station_id}")
+
+    return new_rows
+
 def load_noaa_tides_data_all_products(location, use_all_time_data=False):
     """
     Loads a data frame for each data product
@@ -128,28 +225,144 @@ def load_noaa_tides_data_all_products(location, use_all_time_data=False):
     products = ['air_temperature', 'water_temperature',
                 'hourly_height', 'water_level']
 
-    df_hrheight = load_noaa_tides_data_product(start_date=location.start_date,
-                      end_date=location.end_date, product=products[2],
-                      use_all_time_data=use_all_time_data)
+    # read together, see load_noaa_tides_data_products()
+    frames = read_products(location, products, use_all_time_data=use_all_time_data)
+
+    df_hrheight = add_date_time_columns(frames['hourly_height'])
     # print(f"df_hrheight:\n{df_hrheight.tail()}")
 
-    df_waterlvl = load_noaa_tides_data_product(start_date=location.start_date,
-                      end_date=location.end_date, product=products[3],
-                      use_all_time_data=use_all_time_data)
+    df_waterlvl = add_date_time_columns(frames['water_level'])
     # print(f"df_waterlvl:\n{df_waterlvl.tail()}")
 
-    df_watertemp = load_noaa_tides_data_product(start_date=location.start_date,
-                      end_date=location.end_date, product=products[1],
-                      use_all_time_data=use_all_time_data)
+    df_watertemp = add_date_time_columns(frames['water_temperature'])
     # print(f"df_watertemp:\n{df_watertemp.tail()}")
 
-    df_airtemp = load_noaa_tides_data_product(start_date=location.start_date,
-                      end_date=location.end_date, product=products[0],
-                      use_all_time_data=use_all_time_data)
+    df_airtemp = add_date_time_columns(frames['air_temperature'])
     # print(f"df_airtemp:\n{df_airtemp.tail()}")
 
     return df_hrheight, df_waterlvl, df_watertemp, df_airtemp
 
+def load_noaa_tides_data_products(location, products=None, how='outer', resample=None,
+                                  use_all_time_data=False):
+    """
+    Loads several NOAA tides data products for one station as a single wide
+    DataFrame on one datetime "Date Time" index. Columns are labelled by
+    product and column, e.g. `df['water_temperature', 'Water Temp']`.
+
+    The products are read from the clean data cache concurrently and each is
+    only reduced to the location's dates once. Products that aren't on disk
+    yet are downloaded first, see load_noaa_tides_data_product().
+
+    Parameters
+    ----------
+    location : Location
+      Station and date range
+
+    products : list of str, optional
+      Defaults to `water_level`, `hourly_height`, `water_temperature` and
+      `air_temperature`
+
+    how : str, optional
+      `outer` (default) keeps every timestamp of any product, with NaN where
+      a product has no observation. `inner` keeps only the timestamps all
+      products have
+
+    resample : str, optional
+      Pandas frequency such as `h` or `D`. Each product is averaged to this
+      frequency before the products are aligned, e.g. to line up the hourly
+      and 6-minute products
+
+    use_all_time_data : bool, optional
+      See load_noaa_tides_data_product()
+    """
+    if how not in ('outer', 'inner'):
+        raise ValueError(f"unsupported alignment: '{how}'. Choose 'outer' or 'inner'")
+
+    if products is None:
+        products = ['water_level', 'hourly_height',
+                    'water_temperature', 'air_temperature']
+
+    frames = read_products(location, products, resample, use_all_time_data)
+
+    return align_products(frames, how)
+
+def align_products(frames, how='outer'):
+    """
+    Lines up the typed frames of several products on one "Date Time" index,
+    see load_noaa_tides_data_products()
+
+    Parameters
+    ----------
+    frames : dict
+      Product -> DataFrame with a sorted, unique datetime index
+    """
+    frames = {product: df if df.index.is_monotonic_increasing else df.sort_index()
+              for product, df in frames.items()}
+
+    # products sampled at the same times share their index as is
+    index = None
+    for df in frames.values():
+        if index is None:
+            index = df.index
+        elif not index.equals(df.index):
+            index = index.union(df.index) if how == 'outer' else index.intersection(df.index)
+
+    # both indexes are sorted, so the rows of each product are placed with a
+    # binary search instead of a hash lookup per timestamp
+    columns = {}
+    for product, df in frames.items():
+        same = df.index.equals(index)
+        if how == 'outer' and not same:
+            positions = np.searchsorted(index.asi8, df.index.asi8)
+        elif not same:
+            positions = np.searchsorted(df.index.asi8, index.asi8)
+
+        for column in df.columns:
+            values = df[column].to_numpy()
+            if same:
+                pass
+            elif how == 'outer':
+                aligned = np.full(len(index), np.nan, dtype=np.result_type(values.dtype, np.float32))
+                aligned[positions] = values
+                values = aligned
+            else:
+                values = values[positions]
+
+            columns[(product, column)] = values
+
+    wide = pd.DataFrame(columns, index=index)
+    wide.index.name = 'Date Time'
+
+    return wide
+
+def read_products(location, products, resample=None, use_all_time_data=False):
+    """
+    Returns a dict of product -> typed clean data in the location's date
+    range, read concurrently. Downloads the products not on disk yet.
+    """
+    input_start_date = location.start_date
+    input_end_date = location.end_date
+
+    for product in products:
+        if not is_cached(get_data_stem(location, product, use_all_time_data)):
+            load_noaa_tides_data_product(location, product, use_all_time_data,
+                                         date_time_columns=False)
+            # the download may have changed the location's dates
+            location.start_date = input_start_date
+            location.end_date = input_end_date
+
+    def read_product(product):
+        df = read_clean_data(get_data_stem(location, product, use_all_time_data),
+                             location.start_date, location.end_date)
+        df = select_by_dates(df, location)
+
+        if resample is not None:
+            df = df.resample(resample).mean()
+
+        return df
+
+    return dict(zip(products, fetch_in_order(products, read_product)))
+
 def load_noaa_tides_data_product_raw(location, product='hourly_height', use_all_time_data=False, save_raw_data=False):
     """
     Loads the specified NOAA tides data product raw data as a Pandas DataFrame.
@@ -172,7 +385,7 @@ def load_noaa_tides_data_product_raw(location, product='hourly_height', use_all_
     if not os.path.isfile(data_file):
         if save_raw_data:
             print(f"data file for product '{product}' for station {location.station_id} {location.get_station_name()} not found, downloading as '{data_file}'")
-            df = download_all_data(product, data_file, location)
+            df = download_all_data(product, location, data_file)
         else:
             df = get_all_data(product, location)
     else:
@@ -188,6 +401,7 @@ def download_all_data(product, location, filename=None):
     df = get_all_data(product, location)
 
     save_csv(df, filename)
+    DownloadManager(product, location.station_id).clear()
 
     # get file size in MB, os returns in bytes.
     file_size = os.path.getsize(filename) / 1024 / 1024
@@ -228,7 +442,12 @@ def get_all_data(product, location):
       end_year = parse_year(location.end_date)
     
 
-    df = get_multi_year_data(start_year, end_year, product, location)
+    # each month is saved as it arrives, an interrupted pull resumes from
+    # the chunks already on disk. See download_manager.py
+    print(f"Getting '{product}' data for station {location.station_id} {location.get_station_name()} for years: {start_year} to {end_year}...")
+    chunks = get_multi_year_chunks(start_year, end_year, product, location.station_id)
+    manager = DownloadManager(product, location.station_id)
+    df = manager.download(chunks, lambda chunk: fetch_noaa_data(chunk, product))
 
     # print(f"all 'hourly_height' data df.shape: {df.shape}")
     # print(f"all 'hourly_height' data df.columns.values: {df.columns.values}")
@@ -333,12 +552,44 @@ def split_date_time_col(df):
 
     return df
 
+def add_date_time_columns(df, columns=True):
+    """
+    Adds "Date Time", "Date" and "Time" string columns built from the
+    datetime index as the first columns, same layout as
+    split_date_time_col()
+
+    Parameters
+    ----------
+    columns : bool or list, optional
+      `True` for all three columns or a list of the ones to add
+    """
+    if columns is True:
+        columns = ['Date Time', 'Date', 'Time']
+
+    # format the whole index at once as "YYYY-MM-DDTHH:MM", then cut the
+    # date and time out of the fixed width strings
+    stamps = np.datetime_as_string(df.index.values.astype('datetime64[m]'))
+    chars = stamps.astype('<U16').view('<U1').reshape(-1, 16)
+    chars[:, 10] = ' '
+
+    builders = {
+        'Date Time': lambda: chars.view('<U16').ravel(),
+        'Date': lambda: chars[:, :10].copy().view('<U10').ravel(),
+        'Time': lambda: chars[:, 11:].copy().view('<U5').ravel()
+    }
+
+    df = df.copy()
+    for position, col in enumerate(c for c in builders if c in columns):
+        df.insert(position, col, builders[col]().astype(object))
+
+    return df
+
 def set_datetime_index(df):
     """
     Sets the dataframe index to the "Date Time" column. Allows slicing
     the df by date range as in: `df = df["20230501":"20230531"]
     """
-    df.index = pd.to_datetime(df['Date Time'].copy())
+    df.index = parse_date_time(df['Date Time'])
 
 def make_tides_data_tidy(df, product):
     """
@@ -386,7 +637,7 @@ def buildUrls(product, datum, location):
     product = product.lower()
     datum = datum.upper()
 
-    url = 'https://api.tidesandcurrents.noaa.gov/api/prod/datagetter?'
+    url = NOAA_API_URL + '?'
 
     params = {
         # an “identifier” in automated activity / error logs that allows us
@@ -419,6 +670,36 @@ def buildUrls(product, datum, location):
 
     return queryUrl, predictQueryUrl
 
+# NOAA's answer for a date range the station has no records for
+NO_DATA_MESSAGE = 'No data was found'
+
+class NoaaDataError(NoDataError):
+    """
+    The NOAA webservice has no data for the request ("No data was found"),
+    e.g. a month the station has no records for
+    """
+
+class NoaaServiceError(RuntimeError):
+    """
+    The NOAA webservice answered with any other error message instead of
+    data, e.g. when throttling. The request can be retried.
+    """
+
+def read_noaa_csv(url):
+    """
+    Fetches a csv response from the NOAA webservice over the shared pooled
+    session and parses it to a DataFrame
+    """
+    text = get_client().get_text(url)
+
+    # errors come back as a one line message with a 200 status
+    if text.lstrip().startswith('Error'):
+        if NO_DATA_MESSAGE in text:
+            raise NoaaDataError(text.strip())
+        raise NoaaServiceError(text.strip())
+
+    return pd.read_csv(io.StringIO(text))
+
 def getNoaaTidesData(location, product="hourly_height",
                     datum="MLLW"):
     """
@@ -456,34 +737,40 @@ def getNoaaTidesData(location, product="hourly_height",
       see params reference above
     """
 
-    query_url, predict_url = buildUrls(product, location=location,
-                                       datum=datum)
-
-    # print(f"query_url: {query_url}")
     df = None
-    attempts = 0
-    
-    while df is None and attempts < 3:
-      try:
-        if (predict_url != None):
-          # print(f"predict_url: {predict_url}")
-          # predictions are only available on water level / tide data,
-          # create a data frame with the measured and predicted water levels
-          df = pd.merge(pd.read_csv(query_url), pd.read_csv(predict_url),
-                        on='Date Time')
-        else:
-          # create a data frame with the measured air or water temps
-          df = pd.read_csv(query_url)
-      except Exception as e:
-          print("Error retrieving data from NOAA Tides webservice on attempt {}. query_url='{}'"
-                ", predict_url='{}'\n{}\n{}".format((attempts + 1), query_url, predict_url, type(e), e))
 
-      attempts += 1
-      time.sleep(1)
+    try:
+      df = fetch_noaa_data(location, product, datum)
+    except Exception as e:
+        query_url, predict_url = buildUrls(product, location=location,
+                                           datum=datum)
+        print("Error retrieving data from NOAA Tides webservice. query_url='{}'"
+              ", predict_url='{}'\n{}\n{}".format(query_url, predict_url, type(e), e))
 
     # print(f"getNoaaTidesData df:\n{df}")
     return df
 
+def fetch_noaa_data(location, product="hourly_height", datum="MLLW"):
+    """
+    Same as getNoaaTidesData() but raises instead of returning None when
+    the data can't be retrieved. Raises NoaaDataError if NOAA has no data
+    for the date range, NoaaServiceError for any other error message.
+    """
+    query_url, predict_url = buildUrls(product, location=location,
+                                       datum=datum)
+
+    # print(f"query_url: {query_url}")
+    # the client retries failed requests with backoff, see fetch_client.py
+    if (predict_url != None):
+      # print(f"predict_url: {predict_url}")
+      # predictions are only available on water level / tide data,
+      # create a data frame with the measured and predicted water levels
+      return pd.merge(read_noaa_csv(query_url), read_noaa_csv(predict_url),
+                      on='Date Time')
+
+    # create a data frame with the measured air or water temps
+    return read_noaa_csv(query_url)
+
 def get_month_data(location, start_year="2023", start_month="05", start_day="01",
                    product="water_level"):
     """
@@ -528,7 +815,103 @@ def get_month_data(location, start_year="2023", start_month="05", start_day="01"
     # print(f"get_month_data df:\n{df}")
     return df
 
-def get_year_data(year, product, location):
+def get_month_chunk(year, month, station_id):
+    """
+    Returns a `Location` covering one calendar month for the station.
+    Used to split 6-minute interval data pulls into one request per month.
+
+    Parameters
+    ----------
+    year: str
+      Year of the month, format `YYYY`
+
+    month: str
+      Month to cover, format `MM`
+
+    station_id: str
+      NOAA Tides station id
+    """
+    day = "01"
+    day_offset = calc_last_day_of_month(month, int(year))
+    end_day = str(int(day) + day_offset).rjust(2, '0')
+
+    return Location(year + month + day, year + month + end_day, station_id)
+
+def get_year_chunks(year, product, station_id):
+    """
+    Splits a year into the date ranges the NOAA webservice allows per call.
+
+    'water_level', 'air_temperature' and 'water_temperature' are limited to
+    one month per call since they have data in six-minute intervals.
+    'hourly_height' can be pulled for the whole year with one call.
+
+    Returns a list of `Location` objects in date order
+    """
+
+    if product != 'hourly_height':
+        return [get_month_chunk(year, str(month).rjust(2, '0'), station_id)
+                for month in range(1, 13)]
+
+    # last day of the year will always be December 31
+    return [Location(year + "0101", year + "1231", station_id)]
+
+def get_multi_year_chunks(start_year, end_year, product, station_id):
+    """
+    Returns the request chunks for all the years from `start_year` to
+    `end_year` in date order. See get_year_chunks()
+    """
+    chunks = []
+
+    # range does not include the 'stop' number in the values it returns,
+    # increment 'stop' by 1 to get all the data we want
+    for year in range(int(start_year), int(end_year) + 1):
+      chunks.extend(get_year_chunks(str(year), product, station_id))
+
+    return chunks
+
+def get_chunks_between(start_date, end_date, product, station_id):
+    """
+    Returns the request chunks (see get_year_chunks()) covering
+    `start_date` to `end_date`, both in format `YYYYMMDD`. The first and
+    last chunks are trimmed to the date range.
+    """
+    chunks = []
+    for year in range(parse_year(start_date), parse_year(end_date) + 1):
+      for chunk in get_year_chunks(str(year), product, station_id):
+        # keep whole months overlapping the range, dates compare as strings
+        if chunk.end_date[:6] < start_date[:6] or chunk.start_date > end_date:
+          continue
+
+        if chunk.end_date > end_date:
+          chunk.end_date = end_date
+        if product == 'hourly_height' and chunk.start_date < start_date:
+          # yearly request, start at the month of `start_date`
+          chunk.start_date = start_date[:6] + "01"
+
+        chunks.append(chunk)
+
+    return chunks
+
+def get_chunks_data(chunks, product, max_workers=None):
+    """
+    Fetches the chunks concurrently and assembles them in date order
+    """
+    assembler = ChunkAssembler()
+    for temp in fetch_chunks(chunks, product, max_workers):
+      assembler.add(temp)
+
+    return assembler.to_frame()
+
+def fetch_chunks(chunks, product, max_workers=None):
+    """
+    Retrieves the data for each chunk concurrently. Results are yielded in
+    the same order as `chunks`. See fetch_engine.fetch_in_order()
+    """
+    return fetch_in_order(chunks,
+                          lambda chunk: getNoaaTidesData(chunk, product=product),
+                          max_workers=max_workers)
+
+def get_year_data(year, product, location, max_workers=None):
     """
     Retrieves a year's worth of NOAA data for the specified product
 
@@ -539,67 +922,33 @@ def get_year_data(year, product, location):
 
     product: str, optional
       Type of data to pull. See getNoaaTidesData()
+
+    max_workers: int, optional
+      Number of months to request at the same time.
+      See fetch_engine.MAX_WORKERS
     """
 
-    # initial variables for start and end date strings for the NOAA calls
-    month = "01"
-    day = "01"
+    chunks = get_year_chunks(year, product, location.station_id)
 
-    # data length is limited to one month for: 'water_level', 'air_temperature',
-    # and 'water_temperature' since they have data in six-minute intervals
-    if (product != 'hourly_height'):
-
-      # print(f"yyyymmdd: {year + month + day}")
-      df = get_month_data(location, start_year=year, start_month=month, start_day=day,
-                          product=product)
-      # print(f"df.shape: {df.shape}")
-
-      month_num = int(month)
-      while (month_num < 12):
-          month = f"0{month_num + 1}" if month_num < 9 else f"{month_num + 1}"
-          month_num = int(month)
-          # print(f"yyyymmdd: {year + month + day}")
-          temp = get_month_data(location, start_year=year, start_month=month,
-                                start_day=day, product=product)
-          # print(f"temp.shape: {temp.shape}")
-
-          df = pd.concat([df, temp], axis=0)
-          # print(f"df.shape: {df.shape}")
-    else:
-      # last day of the year will always be December 31
-      # no special calculations here
-      end_month = "12"
-      end_day = "31"
-      # data length is limited to one year for 'hourly_height'
-      # get a year's worth of 'hourly_height' data with one call
-      location.start_date = year + month + day
-      location.end_date = year + end_month + end_day
-      df = getNoaaTidesData(location, product=product)
-      # print(f"df.shape: {df.shape}")
+    # results come back in date order
+    df = get_chunks_data(chunks, product, max_workers)
 
     # print(f"get_year_data, df.shape: {df.shape}")
-    # print(f"get_year_data df:\n{df}")
     print(f"Got year of data for product '{product}' station {location.station_id} year {year}")
     return df
 
-def get_multi_year_data(start_year, end_year, product, location):
+def get_multi_year_data(start_year, end_year, product, location, max_workers=None):
     """
-    Pulls data for multiple years, one year at a time.
+    Pulls data for multiple years. The monthly (or yearly for
+    'hourly_height') requests for all the years are issued concurrently,
+    at most `max_workers` at a time, and reassembled in date order.
     """
 
     print(f"Getting '{product}' data for station {location.station_id} {location.get_station_name()} for years: {start_year} to { end_year}...")
 
-    df = pd.DataFrame()
-
-    # range does not include the 'stop' number in the values it returns,
-    # increment 'stop' by 1 to get all the data we want
-    for year in range(int(start_year), int(end_year) + 1):
-      #print(f"Getting '{product}' data for year: {year}")
-      temp = get_year_data(str(year), product, location)
-      # print(f"get_multi_year_data temp.shape: {temp.shape}")
-      # print(f"get_multi_year_data temp.columns.values: {temp.columns.values}")
+    chunks = get_multi_year_chunks(start_year, end_year, product, location.station_id)
 
-      df = pd.concat([df, temp])
+    df = get_chunks_data(chunks, product, max_workers)
 
     # print(f"get_multi_year_data df:\n{df}")
     print(f"Got data for years {start_year} to {end_year}")
@@ -0,0 +1,175 @@
+"""
+Running per-month sums and counts of clean tides data, so monthly averages
+don't need the whole history to be read again when new data is added.
+
+The rollup of a data set is saved next to it:
+
+    data/noaa_water_level_8418150_clean_monthly.csv
+
+with one row per month: the sum and count of every measurement column and
+the signature (name, size, modification time) of the file the month was
+computed from. After an update (see tides_cache.append_clean_data()) only
+the monthly partitions that were rewritten are read again. Data cached as
+a single csv is rolled up again in full whenever the file changes.
+
+DS5110 Fall 2023 Project Team 8 SDG
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from tides_cache import get_cache_backend, cache_path, read_clean_data, \
+    data_files, file_signature
+
+def rollup_file(stem):
+    """
+    Returns the file the monthly rollup of the data set `stem` is saved as
+    """
+    return stem + '_monthly.csv'
+
+def update_monthly_rollup(stem, backend=None):
+    """
+    Brings the monthly rollup of `stem` up to date with the cached data and
+    returns it, indexed by "Month" period with a "{column} Sum" and
+    "{column} Count" column per measurement column.
+
+    Returns None if there is no cached data for `stem`.
+    """
+    if backend is None:
+        backend = get_cache_backend()
+
+    files = data_files(stem, backend)
+    if files and not os.path.exists(cache_path(stem, backend)):
+        # migrate the older layout first
+        read_clean_data(stem, backend=backend)
+        files = data_files(stem, backend)
+
+    if not files:
+        return None
+
+    signatures = {file: file_signature(file) for file in files}
+    rollup = read_rollup(stem)
+
+    # months computed from files that haven't changed are kept
+    if rollup is not None:
+        rollup = rollup[rollup['Source'].isin(signatures.values())]
+        done = set(rollup['Source'])
+        stale = [file for file in files if signatures[file] not in done]
+    else:
+        stale = files
+
+    if not stale:
+        return rollup
+
+    print(f"Rolling up {len(stale)} of {len(files)} file(s) of '{stem}' by month")
+
+    if backend.partitioned:
+        df = backend.read_many(stale)
+        # one partition per month, named "YYYY-MM..."
+        sources = {os.path.basename(file)[:7]: signatures[file] for file in stale}
+    else:
+        df = backend.read(stale[0])
+        sources = None
+
+    changed = sum_by_month(df)
+    if sources is None:
+        changed['Source'] = signatures[stale[0]]
+    else:
+        changed['Source'] = changed.index.astype(str).map(sources)
+
+    if rollup is not None and not rollup.empty:
+        rollup = pd.concat([rollup, changed]).sort_index()
+    else:
+        rollup = changed
+
+    write_rollup(rollup, stem)
+
+    return rollup
+
+def sum_by_month(df):
+    """
+    Returns the sum and count of every measurement column per month of `df`
+    (datetime index), summed as float64
+    """
+    columns = df.select_dtypes(include='number').columns
+    grouped = df[columns].astype(np.float64).groupby(df.index.to_period('M'))
+
+    sums = grouped.sum()
+    counts = grouped.count()
+
+    rollup = pd.concat([sums.add_suffix(' Sum'), counts.add_suffix(' Count')], axis=1)
+    rollup.index.names = ['Month']
+
+    return rollup
+
+def monthly_means(stem, columns, start_date=None, end_date=None, backend=None):
+    """
+    Returns the monthly means of `columns` of the data set `stem`, as a
+    DataFrame indexed by "Month" period. Same result as grouping the rows
+    in the date range by month and averaging them.
+
+    Parameters
+    ----------
+    stem : str
+      Cached data set, see tides_cache.read_clean_data()
+
+    columns : list of str
+      e.g. `['Water Level', 'Prediction']`
+
+    start_date, end_date : str, optional
+      Inclusive date range in format `YYYYMMDD`. Months the range only
+      partly covers are summed from their rows
+    """
+    rollup = update_monthly_rollup(stem, backend)
+    if rollup is None:
+        return None
+
+    sum_columns = [f"{column} Sum" for column in columns]
+    count_columns = [f"{column} Count" for column in columns]
+    rollup = rollup[sum_columns + count_columns]
+
+    first = pd.Period(pd.Timestamp(start_date), 'M') if start_date is not None else None
+    last = pd.Period(pd.Timestamp(end_date), 'M') if end_date is not None else None
+    rollup = rollup.loc[first:last]
+
+    # months cut by the date range
+    partial = set()
+    if start_date is not None and pd.Timestamp(start_date).day != 1:
+        partial.add(first)
+    if end_date is not None and not pd.Timestamp(end_date).is_month_end:
+        partial.add(last)
+
+    for month in partial.intersection(rollup.index):
+        rows = read_clean_data(stem, month.strftime('%Y%m%d'), month.strftime('%Y%m%d'),
+                               backend=backend)
+        rows = rows.loc[start_date:end_date]
+        rows = rows[rows.index.to_period('M') == month]
+
+        rollup = rollup.drop(index=month)
+        if not rows.empty:
+            rollup = pd.concat([rollup, sum_by_month(rows[columns])]).sort_index()
+
+    # months with no values in a column average to NaN
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = rollup[sum_columns].to_numpy() / rollup[count_columns].to_numpy()
+    means = pd.DataFrame(means, index=rollup.index, columns=columns)
+
+    return means.astype(np.float32)
+
+def read_rollup(stem):
+    """
+    Returns the saved monthly rollup of `stem`, None if there isn't one
+    """
+    filename = rollup_file(stem)
+    if not os.path.isfile(filename):
+        return None
+
+    rollup = pd.read_csv(filename, index_col='Month')
+    rollup.index = pd.PeriodIndex(rollup.index, freq='M')
+
+    return rollup
+
+def write_rollup(rollup, stem):
+    filename = rollup_file(stem)
+    rollup.to_csv(filename + '.tmp')
+    os.replace(filename + '.tmp', filename)
@@ -0,0 +1,16 @@
+import os
+from station_batch import MAINE_STATIONS, product_batch
+from tides_trends import linear_trends
+
+def main():
+    # monthly means of every station and product, then all trends in one
+    # least-squares pass with the seasonal cycle removed
+    wide = product_batch(MAINE_STATIONS)
+    trends = linear_trends(wide)
+    print(trends)
+
+    os.makedirs('data', exist_ok=True)
+    trends.to_csv('data/monthly_trends.csv')
+
+if __name__ == '__main__':
+    main()
@@ -4,25 +4,19 @@ from storm_helpers import *
 
 def preprocess_storms():
     
-    datafile = "data/raw_storm_df.csv"
-
-    if not isfile(datafile):
-        print("Raw Storms Data not found. Please run 'make get_storms' first.")
-        sys.exit(1)
-    
-    df = pd.read_csv(datafile, dtype=column_data_types)
-
-    # Keep only coastal maine records
-    df = filter_maine_coastal_data(df)
-
-    # Convert and merge date columns into one column "BEGIN_DATE"
-    df = convert_and_merge_date_data(df)
-
-    # Drop Extra Columns
-    df = drop_extra_columns(df)
-
-    # Keep only wind related events
-    df = keep_wind_only(df)
+    if not storm_partition_years():
+        # combined file from older versions of get_storms, split it into
+        # yearly partitions chunk by chunk
+        raw_datafile = "data/raw_storm_df.csv"
+        if not isfile(raw_datafile):
+            print("Raw Storms Data not found. Please run 'make get_storms' first.")
+            sys.exit(1)
+
+        split_storm_partitions(raw_datafile)
+
+    # Coastal maine wind events, "BEGIN_DATE" added and extra columns
+    # already dropped when the partitions were written
+    df = read_storm_partitions()
     
     # Remove outliers
     df = remove_outliers(df, 'MAGNITUDE', 3)
@@ -41,4 +35,4 @@ def preprocess_storms():
 
     print("saved successfully as 'cleaned_storms.csv'")
 
-    return df
\ No newline at end of file
+    return df
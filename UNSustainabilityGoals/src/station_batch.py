@@ -0,0 +1,222 @@
+"""
+Monthly series and trend lines for many stations at once.
+
+The monthly averages of the stations are computed in parallel processes
+and lined up in one wide frame, one column per station, then the trend
+lines of all stations are fitted together (see tides_trends.py):
+
+    locations = [setup_station_by_data_product(name, 'water_level')
+                 for name in MAINE_STATIONS]
+    wide = monthly_batch(locations)
+    trends = fit_trends(wide)       # slope per year and intercept per station
+
+The monthly means of every product of the stations come from their rollup
+pyramids the same way, one column per station and product:
+
+    wide = product_batch(MAINE_STATIONS)
+
+Adding stations adds work for more cores instead of a longer serial run.
+Data that isn't on disk yet is downloaded first, on threads of the calling
+process, so the NOAA webservice sees one per-host cap and rate limit
+however many worker processes the batch uses.
+
+DS5110 Fall 2023 Project Team 8 SDG
+"""
+
+import copy
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from data_editing import average_by_month, fill_missing_months, load_rollups
+from location_class import setup_station_by_data_product
+from tides_trends import linear_trends, elapsed_years
+from load_noaa_tides_data import load_noaa_tides_data_product, get_data_stem
+from tides_cache import is_cached
+from download_scheduler import DownloadJob, run_jobs
+from download_manager import DownloadError
+import fetch_engine
+
+MAINE_STATIONS = ['Portland', 'Eastport', 'Cutler Farris Wharf', 'Seavey Island', 'Bar Harbor']
+
+# station/product downloads run at once before a batch starts
+DOWNLOAD_JOBS = 4
+
+# measurement averaged for each product
+PRODUCT_COLUMNS = {
+    'water_level': 'Water Level',
+    'hourly_height': 'Water Level',
+    'water_temperature': 'Water Temp',
+    'air_temperature': 'Air Temp'
+}
+
+def station_label(location):
+    """
+    Returns the station name, or its id for a station without one
+    """
+    try:
+        return location.get_station_name()
+    except KeyError:
+        return location.station_id
+
+def download_missing(pairs, max_jobs=DOWNLOAD_JOBS):
+    """
+    Downloads and cleans the (location, product) pairs that aren't on disk
+    yet. The downloads run on threads of this process, which share the
+    per-host cap and rate limit in fetch_engine.py, so the worker processes
+    of a batch only read the cache.
+
+    Raises DownloadError if any download failed, run again to resume it.
+    """
+    jobs = []
+    for location, product in pairs:
+        if not is_cached(get_data_stem(location, product)):
+            job = DownloadJob(location.station_id, product)
+            # the load changes the location's dates while it runs
+            job.location = copy.copy(location)
+            jobs.append(job)
+
+    if not jobs:
+        return
+
+    if fetch_engine.MAX_REQUESTS_PER_SECOND is None:
+        fetch_engine.set_rate_limit(fetch_engine.DEFAULT_REQUESTS_PER_SECOND)
+
+    failed = run_jobs(jobs, lambda job: load_noaa_tides_data_product(
+        job.location, job.product, date_time_columns=False), max_jobs=max_jobs)
+    if failed:
+        raise DownloadError(f"{len(failed)} downloads failed: "
+                            f"{', '.join(str(job) for job in failed)}. Run again to retry them")
+
+def monthly_series(location, column='Water Level'):
+    """
+    Returns the monthly averages of `column` for one station as a Series
+    indexed by "Month" period, with NaN for months missing or too sparse
+    to average. Runs in a worker process, see monthly_batch()
+    """
+    df = fill_missing_months(average_by_month(location), location)
+    series = df[column]
+    series.index = pd.PeriodIndex(series.index, freq='M', name='Month')
+
+    return series
+
+def monthly_batch(locations, column='Water Level', max_workers=None):
+    """
+    Computes the monthly averages of several stations in parallel processes
+    and returns them as one DataFrame indexed by "Month" period, one column
+    per station, NaN where a station has no average
+
+    Parameters
+    ----------
+    locations : list of Location
+      Stations and date ranges, see average_by_month()
+
+    column : str, optional
+      `Water Level` or `Prediction`
+
+    max_workers : int, optional
+      Number of processes, defaults to one per station up to the number of
+      CPUs
+    """
+    if max_workers is None:
+        max_workers = min(len(locations), os.cpu_count() or 1)
+
+    download_missing([(location, 'water_level') for location in locations])
+
+    if max_workers <= 1:
+        series = [monthly_series(location, column) for location in locations]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            series = list(pool.map(monthly_series, locations, [column] * len(locations)))
+
+    wide = pd.concat(series, axis=1, keys=[station_label(location) for location in locations])
+    wide.index.name = 'Month'
+
+    return wide.sort_index()
+
+def product_means(station, products):
+    """
+    Returns the monthly means of `products` for one station as a DataFrame
+    indexed by "Month" period, one column per product, read from the month
+    level of the rollup pyramids. Runs in a worker process, see
+    product_batch()
+    """
+    columns = {}
+    for product in products:
+        location = setup_station_by_data_product(station, product)
+        column = PRODUCT_COLUMNS[product]
+
+        level = load_rollups(location, product, 'month', [column])
+        means = level[f"{column} Mean"]
+        means.index = pd.PeriodIndex(means.index, freq='M', name='Month')
+        columns[product] = means
+
+    return pd.DataFrame(columns)
+
+def product_batch(stations, products=None, max_workers=None):
+    """
+    Computes the monthly means of several stations and products in parallel
+    processes and returns them as one DataFrame indexed by "Month" period,
+    with a (station, product) column each, NaN where there is no mean
+
+    Parameters
+    ----------
+    stations : list of str
+      Station names, see location_class.setup_station_by_data_product()
+
+    products : list of str, optional
+      Products to average, all of PRODUCT_COLUMNS by default
+
+    max_workers : int, optional
+      Number of processes, defaults to one per station up to the number of
+      CPUs
+    """
+    if products is None:
+        products = list(PRODUCT_COLUMNS)
+    if max_workers is None:
+        max_workers = min(len(stations), os.cpu_count() or 1)
+
+    download_missing([(setup_station_by_data_product(station, product), product)
+                      for station in stations for product in products])
+
+    if max_workers <= 1:
+        frames = [product_means(station, products) for station in stations]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            frames = list(pool.map(product_means, stations, [products] * len(stations)))
+
+    wide = pd.concat(frames, axis=1, keys=stations, names=['Station', 'Product'])
+    wide.index.name = 'Month'
+
+    return wide.sort_index()
+
+def fit_trends(wide):
+    """
+    Fits a least-squares line through every column of `wide` (months ->
+    value). NaNs are left out of each station's fit.
+
+    Returns a DataFrame indexed by station with the "Slope" per year, the
+    "Intercept" at the first month of `wide`, its "Std Error", "CI Low",
+    "CI High" and the "Count" of months used, see
+    tides_trends.linear_trends()
+    """
+    trends = linear_trends(wide, seasonal=False)
+    trends.index.name = 'Station'
+
+    return trends
+
+def trend_lines(wide, trends):
+    """
+    Returns the fitted values of every station's trend line over the months
+    of `wide`, NaN outside the months the station has averages for
+    """
+    x = elapsed_years(wide.index)
+    lines = trends['Intercept'].to_numpy() + np.outer(x, trends['Slope'].to_numpy())
+
+    observed = wide.notna().to_numpy()
+    first = observed.argmax(axis=0)
+    last = len(wide) - 1 - observed[::-1].argmax(axis=0)
+    rows = np.arange(len(wide))[:, np.newaxis]
+    lines[(rows < first) | (rows > last)] = np.nan
+
+    return pd.DataFrame(lines, index=wide.index, columns=wide.columns)
@@ -0,0 +1,167 @@
+"""
+Storm event counts and magnitude statistics precomputed by year, month,
+event type and zone (CZ_FIPS), so the storm visuals and helpers can query
+them without rescanning the events.
+
+    cube = StormCube(df)
+    cube.average_per_year(7, 1996, 2023)    # average July storms per year
+
+Counts for a range of years are answered from cumulative sums over the
+years, so the cost of a query doesn't grow with the number of years.
+
+DS5110 Fall 2023 Project Team 8 SDG
+"""
+
+import numpy as np
+import pandas as pd
+
+class StormCube:
+    """
+    Counts and magnitude statistics of storm events, one cell per year,
+    month, event type and zone.
+
+    Parameters
+    ----------
+    df : DataFrame
+      Storm events with "EVENT_TYPE", "CZ_FIPS" and "MAGNITUDE" columns,
+      see preprocess_storms()
+
+    date_column : str, optional
+      Column with the event dates
+    """
+
+    def __init__(self, df, date_column='BEGIN_DATE'):
+        dates = pd.to_datetime(df[date_column])
+        years = dates.dt.year.to_numpy()
+
+        first_year = years.min() if len(years) else 0
+        last_year = years.max() if len(years) else -1
+        self.years = np.arange(first_year, last_year + 1)
+        self.event_types = np.array(sorted(df['EVENT_TYPE'].dropna().unique()), dtype=object)
+        self.zones = np.array(sorted(df['CZ_FIPS'].dropna().unique()))
+
+        shape = (len(self.years), 12, len(self.event_types), len(self.zones))
+        cells = np.ravel_multi_index((
+            years - first_year,
+            dates.dt.month.to_numpy() - 1,
+            np.searchsorted(self.event_types, df['EVENT_TYPE'].to_numpy(dtype=object)),
+            np.searchsorted(self.zones, df['CZ_FIPS'].to_numpy())
+        ), shape) if len(years) else np.array([], dtype=np.int64)
+        size = int(np.prod(shape))
+
+        self.counts = np.bincount(cells, minlength=size).reshape(shape)
+
+        magnitude = df['MAGNITUDE'].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(magnitude)
+        self.magnitude_count = np.bincount(cells[valid], minlength=size).reshape(shape)
+        self.magnitude_sum = np.bincount(cells[valid], weights=magnitude[valid],
+                                         minlength=size).reshape(shape)
+        magnitude_max = np.full(size, np.nan)
+        np.fmax.at(magnitude_max, cells[valid], magnitude[valid])
+        self.magnitude_max = magnitude_max.reshape(shape)
+
+        # storm counts per month summed over the years before each year,
+        # a year range is the difference of two rows
+        self._cumulative = np.zeros((len(self.years) + 1, 12), dtype=np.int64)
+        np.cumsum(self.counts.sum(axis=(2, 3)), axis=0, out=self._cumulative[1:])
+
+    def count(self, months=None, start_year=None, end_year=None, event_types=None, zones=None):
+        """
+        Returns the number of storms in the given months and years
+
+        Parameters
+        ----------
+        months : int or list of int, optional
+          1 to 12, all months if not given
+
+        start_year, end_year : int, optional
+          Inclusive year range, all years if not given
+
+        event_types, zones : list, optional
+          Only count these event types / CZ_FIPS zones
+        """
+        first, last = self._year_slice(start_year, end_year)
+        months = self._month_index(months)
+
+        if event_types is None and zones is None:
+            return int((self._cumulative[last] - self._cumulative[first])[months].sum())
+
+        return int(self._select(self.counts, first, last, months, event_types, zones).sum())
+
+    def average_per_year(self, months, start_year, end_year, event_types=None, zones=None):
+        """
+        Average number of storms per year in the given months over the years
+        `start_year` to `end_year`, e.g. the average number of July storms
+        """
+        return self.count(months, start_year, end_year, event_types, zones) \
+            / (end_year - start_year + 1)
+
+    def counts_by_year(self, months=None, event_types=None, zones=None):
+        """
+        Returns the number of storms per year as a Series, for the years that
+        had any
+        """
+        months = self._month_index(months)
+        counts = self._select(self.counts, 0, len(self.years), months, event_types, zones)
+        counts = pd.Series(counts.sum(axis=(1, 2, 3)), index=pd.Index(self.years, name='Year'))
+
+        return counts[counts > 0]
+
+    def counts_by_year_month(self, event_types=None, zones=None):
+        """
+        Returns a DataFrame with "Year", "Month" and "StormCount" columns for
+        every month that had any storms
+        """
+        counts = self._select(self.counts, 0, len(self.years), self._month_index(None),
+                              event_types, zones).sum(axis=(2, 3))
+        year_index, month_index = np.nonzero(counts)
+
+        return pd.DataFrame({
+            'Year': self.years[year_index],
+            'Month': month_index + 1,
+            'StormCount': counts[year_index, month_index]
+        })
+
+    def magnitude_stats(self, months=None, start_year=None, end_year=None,
+                        event_types=None, zones=None):
+        """
+        Returns the number of events with a magnitude, the mean and the
+        maximum magnitude in the given months, years, event types and zones
+        """
+        first, last = self._year_slice(start_year, end_year)
+        months = self._month_index(months)
+
+        count = self._select(self.magnitude_count, first, last, months, event_types, zones).sum()
+        total = self._select(self.magnitude_sum, first, last, months, event_types, zones).sum()
+        maximum = self._select(self.magnitude_max, first, last, months, event_types, zones)
+
+        return {
+            'count': int(count),
+            'mean': total / count if count else np.nan,
+            'max': np.nanmax(maximum) if count else np.nan
+        }
+
+    def _year_slice(self, start_year, end_year):
+        first_year = self.years[0] if len(self.years) else 0
+        first = 0 if start_year is None else start_year - first_year
+        last = len(self.years) if end_year is None else end_year - first_year + 1
+
+        first = min(max(first, 0), len(self.years))
+        last = min(max(last, first), len(self.years))
+
+        return first, last
+
+    def _month_index(self, months):
+        if months is None:
+            return np.arange(12)
+
+        return np.atleast_1d(months) - 1
+
+    def _select(self, values, first, last, months, event_types, zones):
+        values = values[first:last][:, months]
+        if event_types is not None:
+            values = values[:, :, np.isin(self.event_types, event_types)]
+        if zones is not None:
+            values = values[:, :, :, np.isin(self.zones, zones)]
+
+        return values
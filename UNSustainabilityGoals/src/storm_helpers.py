@@ -1,25 +1,62 @@
+import os
+import numpy as np
 import pandas as pd
-
-# There are mixed types in some of the columns, this is a list to cast them as strings
-
-# Define data types for columns with mixed types
-column_data_types = {
-    16: str,
-    25: str,
-    26: str,
-    28: str,
-    29: str,
-    34: str,
-    35: str,
-    37: str,
-    39: str,
-    40: str,
-    42: str,
-    43: str,
-    48: str,
-    49: str,
+from tides_cache import has_pyarrow
+from storm_cube import StormCube
+
+# Columns read from the NCEI storm details files and their types. Only
+# these columns are loaded: the ones filter_maine_coastal_data(),
+# convert_and_merge_date_data() and keep_wind_only() need, and the ones
+# drop_extra_columns() keeps. Low cardinality text columns are categoricals,
+# which also makes the string filters run once per category, not per row.
+# Casualty counts are nullable, some older records leave them blank.
+storm_column_types = {
+    'BEGIN_YEARMONTH': 'int32',
+    'BEGIN_DAY': 'int8',
+    'BEGIN_TIME': 'int16',
+    'END_YEARMONTH': 'int32',
+    'END_DAY': 'int8',
+    'END_TIME': 'int16',
+    'EVENT_ID': 'int32',
+    'STATE': 'category',
+    'STATE_FIPS': 'int8',
+    'EVENT_TYPE': 'category',
+    'CZ_TYPE': 'category',
+    'CZ_FIPS': 'int16',
+    'INJURIES_DIRECT': 'Int16',
+    'INJURIES_INDIRECT': 'Int16',
+    'DEATHS_DIRECT': 'Int16',
+    'DEATHS_INDIRECT': 'Int16',
+    'DAMAGE_PROPERTY': str,
+    'SOURCE': 'category',
+    'MAGNITUDE': 'float32',
+    'MAGNITUDE_TYPE': 'category',
+    'FLOOD_CAUSE': 'category',
+    'CATEGORY': 'float32',
+    'BEGIN_LOCATION': str,
+    'END_LOCATION': str,
+    'DATA_SOURCE': 'category',
 }
 
+def read_storm_csv(file, **kwargs):
+    """
+    Reads a storm details csv (plain or gzipped) with the columns and types
+    in `storm_column_types`. Keyword arguments go to `pd.read_csv`, e.g.
+    `chunksize`.
+    """
+    return pd.read_csv(file, usecols=list(storm_column_types), dtype=storm_column_types, **kwargs)
+
+def apply_storm_types(df):
+    """
+    Restores the `storm_column_types` categoricals of the columns in `df`.
+    Needed after concatenating frames read separately, as categoricals with
+    different categories are combined as plain objects.
+    """
+    categories = {column: 'category' for column, dtype in storm_column_types.items()
+                  if dtype == 'category' and column in df.columns}
+
+    return df.astype(categories)
+
 def filter_maine_coastal_data(input_df):
     # Drop All Non-Maine Data
     maine_df = input_df[input_df['STATE'].str.contains('MAINE', case=False, na=False)]
@@ -35,19 +72,48 @@ def filter_maine_coastal_data(input_df):
 
     return coastal_df
 
-def convert_and_merge_date_data(input_df):
-    # Make a copy of the input DataFrame
-    coastal_df = input_df.copy()
+def storm_dates(yearmonth, day, hhmm=None):
+    """
+    Builds datetime64 values from the integer date columns of the storm
+    details files without going through strings.
 
-    # Convert columns to string
-    coastal_df['BEGIN_YEARMONTH'] = coastal_df['BEGIN_YEARMONTH'].astype(str)
-    coastal_df['BEGIN_DAY'] = coastal_df['BEGIN_DAY'].astype(str)
+    Parameters
+    ----------
+    yearmonth : array-like of int
+      e.g. BEGIN_YEARMONTH, 202307
 
-    # Combine and convert to datetime
-    coastal_df['BEGIN_DATE'] = pd.to_datetime(
-        coastal_df['BEGIN_YEARMONTH'] + coastal_df['BEGIN_DAY'], format='%Y%m%d')
+    day : array-like of int
+      e.g. BEGIN_DAY
 
-    return coastal_df
+    hhmm : array-like of int, optional
+      Time of day, e.g. BEGIN_TIME, 1530 for 15:30. Dates are at midnight
+      when not given.
+    """
+    yearmonth = np.asarray(yearmonth, dtype=np.int64)
+    months = (yearmonth // 100 - 1970) * 12 + yearmonth % 100 - 1
+
+    # months since the epoch -> first day of the month -> day of the month
+    dates = months.astype('datetime64[M]').astype('datetime64[m]')
+    dates = dates + (np.asarray(day, dtype=np.int64) - 1) * 1440
+
+    if hhmm is not None:
+        hhmm = np.asarray(hhmm, dtype=np.int64)
+        dates = dates + hhmm // 100 * 60 + hhmm % 100
+
+    return dates.astype('datetime64[ns]')
+
+def convert_and_merge_date_data(input_df):
+    """
+    Adds "BEGIN_DATE" and "END_DATE" and replaces the "BEGIN_DATE_TIME" and
+    "END_DATE_TIME" text with datetimes that include the time of day
+    """
+    return input_df.assign(
+        BEGIN_DATE=storm_dates(input_df['BEGIN_YEARMONTH'], input_df['BEGIN_DAY']),
+        END_DATE=storm_dates(input_df['END_YEARMONTH'], input_df['END_DAY']),
+        BEGIN_DATE_TIME=storm_dates(input_df['BEGIN_YEARMONTH'], input_df['BEGIN_DAY'],
+                                    input_df['BEGIN_TIME']),
+        END_DATE_TIME=storm_dates(input_df['END_YEARMONTH'], input_df['END_DAY'],
+                                  input_df['END_TIME']))
 
 def filter_dataframe_by_date_range(df, start_date, end_date, date_column='BEGIN_DATE'):
     """
@@ -124,8 +190,9 @@ def drop_extra_columns(data):
     'EPISODE_NARRATIVE',
     'EVENT_NARRATIVE',
     ]
-    cleaned_df = data.drop(columns=drop_columns, axis=1)\
-    
+    # columns not read by read_storm_csv() are already gone
+    cleaned_df = data.drop(columns=drop_columns, axis=1, errors='ignore')
+
     return cleaned_df
 
 # Keep Only Wind Events
@@ -147,43 +214,139 @@ def keep_wind_only(data):
 
     return wind_df
 
-def storms_in_given_month(df, target_month, start_year, end_year):
-    # Assuming 'BEGIN_DATE' is in datetime format, if not convert it to datetime using pd.to_datetime
-    df['BEGIN_DATE'] = pd.to_datetime(df['BEGIN_DATE'])
+# rows read at a time when streaming the storm details files
+STORM_CHUNK_SIZE = 100000
+
+# coastal maine wind events, one file per year, written by get_storms:
+#
+#     data/storms/2023.parquet
+#
+# csv is used instead of Parquet when pyarrow isn't installed
+STORM_PARTITION_DIR = 'data/storms'
+
+def filter_storm_chunk(chunk):
+    """
+    Keeps the coastal maine wind events in one chunk of a details file,
+    with "BEGIN_DATE" added and the unused columns dropped
+    """
+    chunk = filter_maine_coastal_data(chunk)
+    chunk = keep_wind_only(chunk)
+    chunk = convert_and_merge_date_data(chunk)
 
-    # Create new columns for the month and year
-    df['Month'] = df['BEGIN_DATE'].dt.month
-    df['Year'] = df['BEGIN_DATE'].dt.year
+    return drop_extra_columns(chunk)
 
-    # Filter the dataframe for storms in the specified month and years
-    selected_storms = df[(df['Month'] == target_month) & (df['Year'] >= start_year) & (df['Year'] <= end_year)]
+def stream_storm_details(file, chunksize=STORM_CHUNK_SIZE):
+    """
+    Reads a storm details csv (plain or gzipped) `chunksize` rows at a time
+    and returns only the rows kept by filter_storm_chunk(), so memory use
+    depends on the chunk size rather than on the size of the file.
+    """
+    kept = [filter_storm_chunk(chunk) for chunk in read_storm_csv(file, chunksize=chunksize)]
 
-    # Count the number of storms in the specified month and years
-    num_storms = selected_storms.shape[0]
+    return apply_storm_types(pd.concat(kept, ignore_index=True))
 
-    return num_storms
+def storm_partition_file(year, directory=STORM_PARTITION_DIR):
+    extension = '.parquet' if has_pyarrow() else '.csv'
 
-def average_storms_in_given_month(df, target_month, start_year, end_year):
-    # Assuming 'BEGIN_DATE' is in datetime format, if not convert it to datetime using pd.to_datetime
-    df['BEGIN_DATE'] = pd.to_datetime(df['BEGIN_DATE'])
+    return os.path.join(directory, f"{year}{extension}")
+
+def write_storm_partition(df, year, directory=STORM_PARTITION_DIR):
+    """
+    Replaces the partition for `year`. Written even when `df` is empty so
+    the year is known to have been processed.
+    """
+    filename = storm_partition_file(year, directory)
+    os.makedirs(directory, exist_ok=True)
+    temp_file = filename + '.tmp'
+
+    if filename.endswith('.parquet'):
+        df.to_parquet(temp_file, index=False)
+    else:
+        df.to_csv(temp_file, index=False)
+
+    os.replace(temp_file, filename)
+
+def remove_storm_partition(year, directory=STORM_PARTITION_DIR):
+    filename = storm_partition_file(year, directory)
+    if os.path.isfile(filename):
+        os.remove(filename)
+
+def storm_partition_years(directory=STORM_PARTITION_DIR):
+    """
+    Returns the years with a partition on disk, in order
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    extension = os.path.splitext(storm_partition_file(0, directory))[1]
+    names = [name[:-len(extension)] for name in os.listdir(directory) if name.endswith(extension)]
 
-    # Create new columns for the month and year
-    df['Month'] = df['BEGIN_DATE'].dt.month
-    df['Year'] = df['BEGIN_DATE'].dt.year
+    return sorted(int(name) for name in names if name.isdigit())
 
-    # Filter the dataframe for storms in the specified month and years
-    selected_storms = df[(df['Month'] == target_month) & (df['Year'] >= start_year) & (df['Year'] <= end_year)]
+def read_storm_partitions(years=None, directory=STORM_PARTITION_DIR):
+    """
+    Loads the coastal maine wind events for the given years, or for every
+    year on disk. Only the partitions for the requested years are read.
 
-    # Count the number of storms in the specified month and years
-    num_storms = selected_storms.shape[0]
+    Parameters
+    ----------
+    years : iterable of int, optional
+      e.g. `range(2000, 2024)`
+    """
+    available = storm_partition_years(directory)
+    if years is not None:
+        years = set(years)
+        available = [year for year in available if year in years]
+
+    frames = []
+    for year in available:
+        filename = storm_partition_file(year, directory)
+        if filename.endswith('.parquet'):
+            df = pd.read_parquet(filename)
+        else:
+            df = pd.read_csv(filename, parse_dates=['BEGIN_DATE', 'END_DATE',
+                                                    'BEGIN_DATE_TIME', 'END_DATE_TIME'])
+
+        # empty partitions carry no type information, skip them
+        if len(df):
+            frames.append(df)
+
+    if not frames:
+        return pd.DataFrame()
+
+    return apply_storm_types(pd.concat(frames, ignore_index=True))
+
+def split_storm_partitions(file, directory=STORM_PARTITION_DIR, chunksize=STORM_CHUNK_SIZE):
+    """
+    Writes one partition per year from a csv holding several years, e.g.
+    the combined raw_storm_df.csv from older versions of get_storms
+    """
+    df = stream_storm_details(file, chunksize)
 
-    # Calculate the number of years in the specified time span
-    num_years = end_year - start_year + 1
+    for year, year_df in df.groupby(df['BEGIN_DATE'].dt.year):
+        write_storm_partition(year_df, year, directory)
 
-    # Calculate the average number of storms per year
-    average_storms = num_storms / num_years
+def storms_in_given_month(df, target_month, start_year, end_year):
+    """
+    Number of storms in `target_month` of the years `start_year` to
+    `end_year`. `df` is a StormCube, or storm events to build one from.
+    """
+    return as_storm_cube(df).count(target_month, start_year, end_year)
 
-    return average_storms
+def average_storms_in_given_month(df, target_month, start_year, end_year):
+    """
+    Average number of storms per year in `target_month` over the years
+    `start_year` to `end_year`. `df` is a StormCube, or storm events to
+    build one from.
+    """
+    return as_storm_cube(df).average_per_year(target_month, start_year, end_year)
+
+def as_storm_cube(df):
+    """
+    Returns `df` if it is already a StormCube, otherwise builds one. Build
+    the cube once and pass it around when querying repeatedly.
+    """
+    return df if isinstance(df, StormCube) else StormCube(df)
 
 
 import pandas as pd
@@ -8,6 +8,7 @@ from os.path import isfile
 from storm_helpers import *
 from helpers import save_or_display_graph
 from preprocess_storms import *
+from storm_cube import StormCube
 
 datafile = "data/cleaned_storms.csv"
 
@@ -16,14 +17,16 @@ if not isfile(datafile):
     print("Clean Storms Data not found. Attempting to preprocess raw data...")
     df = preprocess_storms()
 else:
-    df = pd.read_csv(datafile)
+    df = pd.read_csv(datafile, parse_dates=['BEGIN_DATE'])
 
-def plot_storms_per_year(df):
+# counts by year, month, event type and zone, built once for all the plots
+cube = StormCube(df)
+
+def plot_storms_per_year(cube):
     '''
     plot the number of weather events per year
     '''
-    df['year'] = pd.to_datetime(df['BEGIN_DATE']).dt.year
-    storm_counts_per_year = df['year'].value_counts().sort_index()
+    storm_counts_per_year = cube.counts_by_year()
 
     # Plotting the data
     plt.figure(figsize=(10, 6))
@@ -34,21 +37,14 @@ def plot_storms_per_year(df):
     plt.grid(True)
     save_or_display_graph(plt, 'Storms per Year')
     plt.show()
-plot_storms_per_year(df)
+plot_storms_per_year(cube)
 
-def plot_average_storms_per_month_over_time(df):
+def plot_average_storms_per_month_over_time(cube):
     '''
     plot the average number of storms per month over time
     '''
-    # Assuming 'BEGIN_DATE' is in datetime format, if not convert it to datetime using pd.to_datetime
-    df['BEGIN_DATE'] = pd.to_datetime(df['BEGIN_DATE'])
-
-    # Create new columns for the month and year
-    df['Month'] = df['BEGIN_DATE'].dt.month
-    df['Year'] = df['BEGIN_DATE'].dt.year
-
-    # Group by Year and Month, and count the occurrences
-    monthly_storm_counts = df.groupby(['Year', 'Month']).size().reset_index(name='StormCount')
+    # Storm counts for each Year and Month with storms
+    monthly_storm_counts = cube.counts_by_year_month()
 
     # Calculate the average number of storms per month
     average_storms_per_month = monthly_storm_counts.groupby('Month')['StormCount'].mean()
@@ -63,12 +59,11 @@ def plot_average_storms_per_month_over_time(df):
     plt.grid(True)
     save_or_display_graph(plt, "avg_monthly_storms")
 
-plot_average_storms_per_month_over_time(df)
+plot_average_storms_per_month_over_time(cube)
 
-def train_and_plot_linear_regression(df):
-    # Convert year to datetime and get number of storms per year
-    df['year'] = pd.to_datetime(df['BEGIN_DATE']).dt.year
-    storm_counts_per_year = df['year'].value_counts().sort_index()
+def train_and_plot_linear_regression(cube):
+    # Get number of storms per year
+    storm_counts_per_year = cube.counts_by_year()
 
     X = storm_counts_per_year.index.values.reshape(-1, 1)  # Years
     y = storm_counts_per_year.values  # Number of storms per year
@@ -95,26 +90,17 @@ def train_and_plot_linear_regression(df):
     save_or_display_graph(plt, 'Linear Regression - Storms per Year')
     plt.show()
 
-train_and_plot_linear_regression(df)
+train_and_plot_linear_regression(cube)
 
 
-def plot_average_storms_in_range(df, start_month, end_month):
+def plot_average_storms_in_range(cube, start_month, end_month):
     '''
     plots the average number of storms in a given range over time
     ie: the average number of storms between june and september per year
     '''
-    # Assuming 'BEGIN_DATE' is in datetime format, if not convert it to datetime using pd.to_datetime
-    df['BEGIN_DATE'] = pd.to_datetime(df['BEGIN_DATE'])
-
-    # Create new columns for the month and year
-    df['Month'] = df['BEGIN_DATE'].dt.month
-    df['Year'] = df['BEGIN_DATE'].dt.year
-
-    # Filter the dataframe for storms between the specified months
-    selected_storms = df[(df['Month'] >= start_month) & (df['Month'] <= end_month)]
-
-    # Group by Year and count the occurrences
-    yearly_storm_counts = selected_storms.groupby('Year').size().reset_index(name='StormCount')
+    # Count the storms between the specified months for each Year
+    yearly_storm_counts = cube.counts_by_year(range(start_month, end_month + 1)) \
+        .reset_index(name='StormCount')
 
     # Convert numerical month representation to month names
     month_names = [calendar.month_name[m] for m in range(start_month, end_month + 1)]
@@ -129,9 +115,9 @@ def plot_average_storms_in_range(df, start_month, end_month):
     file_title = f'avg_storms_{month_names[0]}_{month_names[-1]}_per_year.png'
     save_or_display_graph(plt, file_title)
 
-plot_average_storms_in_range(df, start_month=6, end_month=9)
+plot_average_storms_in_range(cube, start_month=6, end_month=9)
 
-def plot_average_storms_in_month(df, target_month, start_year, end_year):
+def plot_average_storms_in_month(cube, target_month, start_year, end_year):
     '''
     A visual to illustrate the change in the average number of storms in a given month in a given time span
     '''
@@ -140,7 +126,7 @@ def plot_average_storms_in_month(df, target_month, start_year, end_year):
 
     # Loop through each year and calculate the average number of storms in the specified month
     for year in range(start_year, end_year + 1):
-        avg_storms = average_storms_in_given_month(df, target_month=target_month, start_year=year, end_year=year)
+        avg_storms = average_storms_in_given_month(cube, target_month=target_month, start_year=year, end_year=year)
         avg_storms_per_year.append(avg_storms)
 
     # Convert numerical month representation to month names
@@ -161,14 +147,10 @@ def plot_average_storms_in_month(df, target_month, start_year, end_year):
 start_year = 1996
 end_year = 2023
 target_month = 7
-plot_average_storms_in_month(df, 7, 1996, 2023)
+plot_average_storms_in_month(cube, 7, 1996, 2023)
 
 def plot_wind_events_magnitude(df):
-    # Convert 'BEGIN_DATE' to datetime
-    df['BEGIN_DATE'] = pd.to_datetime(df['BEGIN_DATE'])
-
-    # Extract year from 'BEGIN_DATE' and create a new column 'YEAR'
-    df['YEAR'] = df['BEGIN_DATE'].dt.year
+    # 'BEGIN_DATE' is parsed once when the data is loaded
 
     # Filter rows to keep only 'Thunderstorm Wind' and 'High Wind' events
     selected_event_types = ['Thunderstorm Wind', 'High Wind']
@@ -0,0 +1,501 @@
+"""
+On-disk cache for clean NOAA tides data.
+
+Clean data is stored with a datetime64 "Date Time" index and float32
+measurement columns. The storage format is pluggable: columnar formats
+(Parquet, Feather) read the typed columns back directly with no date
+parsing, while the CSV backend keeps the original file layout.
+
+Columnar data is partitioned by month, one file per month under a
+directory named after the data set:
+
+    data/noaa_water_level_8418150_clean/2023-05.parquet
+
+so reading a date range only opens the months that overlap it.
+
+Existing `data/noaa_{product}_{station_id}_clean.csv` files are migrated
+to the configured format the first time they are loaded.
+
+DS5110 Fall 2023 Project Team 8 SDG
+"""
+
+import hashlib
+import importlib.util
+import os
+import numpy as np
+import pandas as pd
+from helpers import LRUCache
+
+DATE_TIME_FORMAT = '%Y-%m-%d %H:%M'
+
+# data sets read in this process are kept in memory, so loading the same
+# station and product again doesn't touch the disk. See read_clean_data()
+MAX_CACHED_READS = 4
+_recent_reads = LRUCache(MAX_CACHED_READS)
+
+class CsvCache:
+    """
+    Original csv layout. Dates are re-parsed on every read.
+    """
+    name = 'csv'
+    extension = '.csv'
+    partitioned = False
+
+    def read(self, path):
+        # pyarrow's csv reader parses the timestamps itself while reading
+        engine = 'pyarrow' if has_pyarrow() else 'c'
+        df = pd.read_csv(path, engine=engine)
+
+        # move the dates straight into the index, no string column copies
+        df.index = parse_date_time(df.pop('Date Time'))
+
+        return _to_float32(df)
+
+    def write(self, df, path):
+        df.to_csv(path, index=True, index_label='Date Time',
+                  date_format=DATE_TIME_FORMAT)
+
+class ParquetCache:
+    """
+    Parquet files, requires pyarrow
+    """
+    name = 'parquet'
+    extension = '.parquet'
+    partitioned = True
+
+    def read(self, path):
+        return pd.read_parquet(path)
+
+    def read_many(self, paths):
+        # one multi-threaded arrow read instead of a file at a time
+        import pyarrow.parquet as pq
+
+        return pq.read_table(paths).to_pandas()
+
+    def write(self, df, path):
+        df.to_parquet(path, index=True)
+
+class FeatherCache:
+    """
+    Feather (Arrow IPC) files, requires pyarrow. Feather can't store an
+    index, so "Date Time" is stored as a regular column.
+    """
+    name = 'feather'
+    extension = '.feather'
+    partitioned = True
+
+    def read(self, path):
+        return pd.read_feather(path).set_index('Date Time')
+
+    def read_many(self, paths):
+        return pd.concat([self.read(path) for path in paths])
+
+    def write(self, df, path):
+        df.reset_index().to_feather(path)
+
+cache_backends = {
+    'csv': CsvCache,
+    'parquet': ParquetCache,
+    'feather': FeatherCache
+}
+
+def has_pyarrow():
+    """
+    Returns True if pyarrow is installed, needed by Parquet and Feather.
+    Doesn't import it
+    """
+    return importlib.util.find_spec('pyarrow') is not None
+
+def get_cache_backend(name=None):
+    """
+    Returns the cache backend to use.
+
+    Parameters
+    ----------
+    name : str, optional
+      'parquet', 'feather' or 'csv'. Defaults to the TIDES_CACHE_FORMAT
+      environment variable, then to 'parquet' if pyarrow is installed and
+      'csv' otherwise.
+    """
+    if name is None:
+        name = os.environ.get('TIDES_CACHE_FORMAT')
+
+    if name is None:
+        name = 'parquet' if has_pyarrow() else 'csv'
+
+    name = name.lower()
+    if name not in cache_backends:
+        raise ValueError(f"unsupported cache format: '{name}'. "
+                         f"Choose from {list(cache_backends)}")
+
+    if name != 'csv' and not has_pyarrow():
+        raise ImportError(f"cache format '{name}' requires pyarrow")
+
+    return cache_backends[name]()
+
+def parse_date_time(values):
+    """
+    Parses NOAA "YYYY-MM-DD HH:MM" strings (or already parsed datetimes)
+    to a DatetimeIndex named "Date Time".
+
+    numpy parses the fixed ISO layout in C without pandas' per-string
+    format inference. Anything numpy rejects falls back to pandas with the
+    explicit format.
+    """
+    values = np.asarray(values)
+
+    try:
+        stamps = values.astype('datetime64[m]')
+    except ValueError:
+        stamps = pd.to_datetime(values, format=DATE_TIME_FORMAT).values
+
+    return pd.DatetimeIndex(stamps.astype('datetime64[ns]'), name='Date Time')
+
+def to_typed_frame(df):
+    """
+    Converts clean data with a "Date Time" string column to the cached
+    layout: datetime64 "Date Time" index and float32 measurement columns.
+    """
+    typed = df.drop(columns=['Date Time'])
+    typed.index = parse_date_time(df['Date Time'])
+
+    return _to_float32(typed)
+
+def _to_float32(df):
+    """
+    Casts the numeric measurement columns to float32. NOAA values have at
+    most three decimals so no precision that matters is lost.
+    """
+    float_cols = df.select_dtypes(include='number').columns
+    df[float_cols] = df[float_cols].astype(np.float32)
+
+    return df
+
+# missing values in scaled int16 measurements, see to_scaled_int16()
+INT16_NA = np.iinfo(np.int16).min
+
+# powers of ten tried when scaling measurements to int16, NOAA values have
+# at most three decimals
+INT16_SCALES = [1000, 100, 10, 1]
+
+def to_scaled_int16(df):
+    """
+    Stores each float measurement column as int16 holding the value times
+    the largest power of ten that keeps every value exact and in range,
+    e.g. water levels in feet times 1000 or temperatures times 100. Missing
+    values are INT16_NA. Columns that don't fit stay float32.
+
+    The scales are kept in `df.attrs['scales']`, see from_scaled_int16()
+    """
+    df = df.copy()
+    scales = dict(df.attrs.get('scales', {}))
+
+    for column in df.select_dtypes(include='floating').columns:
+        values = df[column].to_numpy(dtype=np.float64)
+        missing = np.isnan(values)
+        largest = np.abs(values[~missing]).max() if (~missing).any() else 0
+
+        for scale in INT16_SCALES:
+            scaled = np.round(values[~missing] * scale)
+            # float32 values are only exact to about 7 digits
+            if largest * scale <= np.iinfo(np.int16).max and \
+                    np.abs(scaled - values[~missing] * scale).max(initial=0) < 0.01:
+                column_values = np.full(len(values), INT16_NA, dtype=np.int16)
+                column_values[~missing] = scaled
+                df[column] = column_values
+                scales[column] = scale
+                break
+
+    df.attrs['scales'] = scales
+
+    return df
+
+def from_scaled_int16(df):
+    """
+    Converts the int16 measurement columns written by to_scaled_int16()
+    back to float32
+    """
+    df = df.copy()
+    scales = df.attrs.pop('scales', {})
+
+    for column, scale in scales.items():
+        values = df[column].to_numpy()
+        df[column] = np.where(values == INT16_NA, np.nan, values / scale).astype(np.float32)
+
+    return df
+
+def cache_path(stem, backend=None):
+    """
+    Returns the path for the data set `stem` (path without extension):
+    the partition directory for columnar formats, the file for csv
+    """
+    if backend is None:
+        backend = get_cache_backend()
+
+    if backend.partitioned:
+        return stem
+
+    return stem + backend.extension
+
+def is_cached(stem, backend=None):
+    """
+    Returns True if clean data for `stem` is on disk in the configured
+    format or in a layout that can be migrated.
+    """
+    if backend is None:
+        backend = get_cache_backend()
+
+    return os.path.exists(cache_path(stem, backend)) or \
+        _find_migration_source(stem, backend) is not None
+
+def cache_version(stem, backend=None):
+    """
+    Returns a fingerprint of the data cached for `stem` built from the names,
+    sizes and modification times of its files. It changes whenever the data
+    is written, updated or migrated. None if nothing is cached.
+    """
+    files = data_files(stem, backend)
+    if not files:
+        return None
+
+    fingerprint = hashlib.sha1()
+    for file in files:
+        fingerprint.update(f"{file_signature(file)}\n".encode())
+
+    return fingerprint.hexdigest()
+
+def data_files(stem, backend=None):
+    """
+    Returns the files holding the data cached for `stem`: the monthly
+    partitions in date order, the single file, or the file in an older
+    layout that would be migrated. Empty if nothing is cached.
+    """
+    if backend is None:
+        backend = get_cache_backend()
+
+    data_path = cache_path(stem, backend)
+
+    if os.path.isdir(data_path):
+        return [os.path.join(data_path, name) for name in _partition_files(data_path, backend)]
+    if os.path.isfile(data_path):
+        return [data_path]
+
+    source = _find_migration_source(stem, backend)
+    if source is None:
+        return []
+
+    return [source[0]]
+
+def file_signature(file):
+    """
+    Returns "name size mtime" for a data file, it changes whenever the file
+    is rewritten
+    """
+    stat = os.stat(file)
+
+    return f"{os.path.basename(file)} {stat.st_size} {stat.st_mtime_ns}"
+
+def read_clean_data(stem, start_date=None, end_date=None, backend=None):
+    """
+    Reads cached clean data as a typed DataFrame. Migrates data in an older
+    layout to the configured one if that is all that's on disk.
+
+    Parameters
+    ----------
+    stem : str
+      Path of the data set without extension,
+      e.g. `data/noaa_water_level_8418150_clean`
+
+    start_date, end_date : str, optional
+      Date range in format `YYYYMMDD`. Only the monthly partitions
+      overlapping the range are read. Rows outside the range within those
+      months are still returned, see select_by_dates()
+
+    Returns None if there is no cached data for `stem`. Repeated reads of
+    unchanged data are served from memory, each caller gets its own copy.
+    """
+    if backend is None:
+        backend = get_cache_backend()
+
+    data_path = cache_path(stem, backend)
+
+    key = (data_path, start_date, end_date, cache_version(stem, backend))
+    df = _recent_reads.get(key)
+    if df is not None:
+        return df.copy()
+
+    if backend.partitioned and os.path.isdir(data_path):
+        df = read_partitions(data_path, backend, start_date, end_date)
+    elif os.path.isfile(data_path):
+        df = backend.read(data_path)
+
+    if df is not None:
+        _recent_reads.put(key, df)
+        return df.copy()
+
+    source = _find_migration_source(stem, backend)
+    if source is not None:
+        source_file, source_backend = source
+        print(f"Migrating '{source_file}' to '{data_path}'")
+        df = source_backend.read(source_file)
+        write_clean_data(df, stem, backend)
+        return df
+
+    return None
+
+def write_clean_data(df, stem, backend=None):
+    """
+    Writes typed clean data to disk in the configured format, replacing
+    anything already cached for `stem`
+    """
+    if backend is None:
+        backend = get_cache_backend()
+
+    data_path = cache_path(stem, backend)
+
+    if backend.partitioned:
+        # drop partitions left over from a previous, longer data set
+        for name in _partition_files(data_path, backend):
+            os.remove(os.path.join(data_path, name))
+
+        write_partitions(df, data_path, backend)
+    else:
+        backend.write(df, data_path)
+
+    return data_path
+
+def last_cached_timestamp(stem, backend=None):
+    """
+    Returns the newest timestamp cached for `stem`, or None if nothing is
+    cached. For partitioned data only the newest month is read.
+    """
+    if backend is None:
+        backend = get_cache_backend()
+
+    data_path = cache_path(stem, backend)
+
+    if backend.partitioned and os.path.isdir(data_path):
+        names = _partition_files(data_path, backend)
+        if not names:
+            return None
+        df = backend.read(os.path.join(data_path, names[-1]))
+    else:
+        df = read_clean_data(stem, backend=backend)
+
+    if df is None or df.empty:
+        return None
+
+    return df.index.max()
+
+def append_clean_data(df, stem, backend=None):
+    """
+    Merges new typed rows into the data cached for `stem`. Rows with a
+    timestamp that is already cached replace the cached row, so
+    re-fetching the last cached month is safe. Only the monthly partitions
+    the new rows fall in are rewritten.
+    """
+    if backend is None:
+        backend = get_cache_backend()
+
+    data_path = cache_path(stem, backend)
+
+    if not is_cached(stem, backend):
+        return write_clean_data(df, stem, backend)
+
+    if not backend.partitioned:
+        return write_clean_data(_merge_rows(read_clean_data(stem, backend=backend), df),
+                                stem, backend)
+
+    if not os.path.isdir(data_path):
+        # migrate the older layout first
+        read_clean_data(stem, backend=backend)
+
+    for (year, month), part in df.groupby([df.index.year, df.index.month]):
+        part_file = os.path.join(data_path, partition_name(year, month, backend))
+        if os.path.isfile(part_file):
+            part = _merge_rows(backend.read(part_file), part)
+        backend.write(part, part_file)
+
+    return data_path
+
+def _merge_rows(cached, new):
+    """
+    Combines cached and new rows in date order, new rows win on duplicate
+    timestamps
+    """
+    merged = pd.concat([cached, new])
+    merged = merged[~merged.index.duplicated(keep='last')]
+
+    return merged.sort_index()
+
+def partition_name(year, month, backend):
+    """
+    Returns the file name of the partition for a month, e.g. `2023-05.parquet`
+    """
+    return f"{year}-{month:02d}{backend.extension}"
+
+def write_partitions(df, directory, backend):
+    """
+    Writes one file per calendar month in `df`. Existing files for those
+    months are overwritten.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    for (year, month), part in df.groupby([df.index.year, df.index.month]):
+        backend.write(part, os.path.join(directory,
+                                         partition_name(year, month, backend)))
+
+def read_partitions(directory, backend, start_date=None, end_date=None):
+    """
+    Reads and concatenates, in date order, the monthly partitions
+    overlapping the date range. All partitions are read if no dates are
+    given.
+    """
+    names = _partition_files(directory, backend)
+    if not names:
+        return None
+
+    first = _month_key(start_date) if start_date is not None else None
+    last = _month_key(end_date) if end_date is not None else None
+
+    # partition names start with "YYYY-MM" so they compare as dates
+    selected = [name for name in names
+                if (first is None or name[:7] >= first) and
+                   (last is None or name[:7] <= last)]
+
+    if not selected:
+        # keep the columns and dtypes for an empty result
+        return backend.read(os.path.join(directory, names[-1])).iloc[0:0]
+
+    return backend.read_many([os.path.join(directory, name) for name in selected])
+
+def _partition_files(directory, backend):
+    """
+    Returns the sorted partition file names in `directory`
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    return sorted(name for name in os.listdir(directory)
+                  if name.endswith(backend.extension))
+
+def _month_key(date_str):
+    """
+    Converts a date like `20230501` to the partition prefix `2023-05`
+    """
+    return pd.Timestamp(date_str).strftime('%Y-%m')
+
+def _find_migration_source(stem, backend):
+    """
+    Returns (file, backend) for data cached in an older layout: a single
+    columnar file, or the original csv. None if there isn't any.
+    """
+    candidates = [cache_backends[backend.name]()] if backend.partitioned else []
+    candidates.append(CsvCache())
+
+    for source_backend in candidates:
+        source_file = stem + source_backend.extension
+        if source_file != cache_path(stem, backend) and os.path.isfile(source_file):
+            return source_file, source_backend
+
+    return None
@@ -0,0 +1,257 @@
+"""
+Index of the missing observations in the clean tides data.
+
+NOAA data has gaps (station outages, rows dropped by
+make_tides_data_tidy()). The gap index lists them once per
+station/product, at the product's native resolution, and is saved next to
+the clean data when it is written or updated:
+
+    data/noaa_water_level_8418150_clean_gaps.json
+
+    {"interval": "6min", "first": "1996-01-01 00:00", "last": ...,
+     "gaps": [["2003-03-10 12:06", "2003-03-12 08:54"], ...]}
+
+From it, data can be put on the regular grid of the product, missing
+stamps filled or masked, and the coverage of every month reported without
+reindexing the full frame:
+
+    gaps = open_gap_index(location, 'water_level')
+    gaps.coverage_by_month()        # share of each month observed
+
+DS5110 Fall 2023 Project Team 8 SDG
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+from tides_cache import is_cached, read_clean_data, cache_version
+
+# native spacing of each product's observations
+PRODUCT_INTERVALS = {
+    'water_level': '6min',
+    'water_temperature': '6min',
+    'air_temperature': '6min',
+    'hourly_height': '1h'
+}
+
+# months with less of their observations are too sparse to average
+MIN_MONTH_COVERAGE = 0.5
+
+class GapIndex:
+    """
+    Missing intervals of one station/product between its first and last
+    observation
+
+    Parameters
+    ----------
+    first, last : Timestamp
+      First and last observation
+
+    interval : str
+      Spacing of the observations, e.g. `6min`
+
+    gaps : list of (start, end)
+      First and last missing timestamp of every gap, in order
+    """
+
+    def __init__(self, first, last, interval, gaps):
+        self.first = pd.Timestamp(first)
+        self.last = pd.Timestamp(last)
+        self.interval = interval
+        self.step = pd.Timedelta(interval)
+
+        gaps = np.array(gaps, dtype='datetime64[ns]').reshape(-1, 2)
+        self.gaps = pd.DataFrame({'Start': gaps[:, 0], 'End': gaps[:, 1]})
+        self.gaps['Missing'] = (self.gaps['End'] - self.gaps['Start']) // self.step + 1
+
+        # gap positions on the grid, end exclusive
+        self._starts = self._position(self.gaps['Start'].to_numpy())
+        self._ends = self._position(self.gaps['End'].to_numpy()) + 1
+        self._missing_before = np.concatenate([[0], np.cumsum(self._ends - self._starts)])
+
+    @classmethod
+    def from_index(cls, index, interval):
+        """
+        Builds the gap index of a sorted datetime index
+        """
+        step = pd.Timedelta(interval)
+        if len(index) == 0:
+            return cls(pd.NaT, pd.NaT, interval, [])
+
+        stamps = index.values
+        jumps = np.flatnonzero(np.diff(stamps) > step.to_timedelta64())
+        gaps = np.stack([stamps[jumps] + step.to_timedelta64(),
+                         stamps[jumps + 1] - step.to_timedelta64()], axis=1)
+
+        return cls(stamps[0], stamps[-1], interval, gaps)
+
+    def __len__(self):
+        return len(self.gaps)
+
+    def grid(self):
+        """
+        Returns every timestamp from the first to the last observation
+        """
+        return pd.date_range(self.first, self.last, freq=self.step, name='Date Time')
+
+    def mask(self, index):
+        """
+        Returns a boolean array, True for the timestamps of `index` that fall
+        in a gap
+        """
+        positions = self._position(index.values)
+        if not len(self.gaps):
+            return np.zeros(len(positions), dtype=bool)
+
+        gap = np.searchsorted(self._starts, positions, side='right') - 1
+
+        return (gap >= 0) & (positions < self._ends[np.maximum(gap, 0)])
+
+    def reindex(self, df, fill=None):
+        """
+        Returns `df` on the regular grid, with the gap timestamps added.
+        Rows are placed by their grid position, no index lookup needed.
+
+        Parameters
+        ----------
+        df : DataFrame
+          Data this index was built from, or a part of it
+
+        fill : optional
+          None leaves the gaps NaN (masked), `ffill` repeats the last
+          observation, `interpolate` interpolates linearly in time, any other
+          value is used as is
+        """
+        grid = self.grid()
+        positions = self._position(df.index.values)
+        inside = (positions >= 0) & (positions < len(grid))
+
+        columns = {}
+        for column in df.columns:
+            values = np.full(len(grid), np.nan, dtype=np.result_type(df[column].dtype, np.float32))
+            values[positions[inside]] = df[column].to_numpy()[inside]
+            columns[column] = values
+        regular = pd.DataFrame(columns, index=grid)
+
+        if fill is None:
+            return regular
+        if fill == 'ffill':
+            return regular.ffill()
+        if fill == 'interpolate':
+            return regular.interpolate(method='time')
+
+        return regular.fillna(fill)
+
+    def coverage_by_month(self):
+        """
+        Returns a DataFrame indexed by "Month" period with the "Expected" and
+        "Observed" number of observations of every month from the first to
+        the last observation, and their ratio "Coverage"
+        """
+        if pd.isna(self.first):
+            return pd.DataFrame(columns=['Expected', 'Observed', 'Coverage'])
+
+        months = pd.period_range(self.first, self.last, freq='M', name='Month')
+
+        # grid position of the first stamp of each month, and of the end
+        bounds = months.to_timestamp().values
+        bounds = np.append(bounds, (self.last + self.step).to_datetime64())
+        positions = np.clip(-(-(bounds - self.first.to_datetime64()) // self.step.to_timedelta64()),
+                            0, self._position(self.last.to_datetime64()) + 1)
+
+        expected = np.diff(positions)
+        observed = expected - np.diff(self._missing(positions))
+
+        return pd.DataFrame({
+            'Expected': expected,
+            'Observed': observed,
+            'Coverage': observed / np.maximum(expected, 1)
+        }, index=months)
+
+    def sparse_months(self, min_coverage=MIN_MONTH_COVERAGE):
+        """
+        Returns the months with less than `min_coverage` of their
+        observations
+        """
+        coverage = self.coverage_by_month()
+
+        return coverage.index[coverage['Coverage'] < min_coverage]
+
+    def to_json(self):
+        return {
+            'interval': self.interval,
+            'first': None if pd.isna(self.first) else str(self.first),
+            'last': None if pd.isna(self.last) else str(self.last),
+            'gaps': [[str(start), str(end)] for start, end in zip(self.gaps['Start'], self.gaps['End'])]
+        }
+
+    def _position(self, stamps):
+        # grid position of each timestamp
+        return (np.asarray(stamps, dtype='datetime64[ns]') - self.first.to_datetime64()) \
+            // self.step.to_timedelta64()
+
+    def _missing(self, positions):
+        # missing stamps before each grid position
+        gap = np.searchsorted(self._starts, positions, side='left')
+        missing = self._missing_before[gap]
+
+        # part of the gap the position falls in
+        inside = gap > 0
+        previous = np.maximum(gap - 1, 0)
+        overrun = np.where(inside, np.maximum(self._ends[previous] - positions, 0), 0) \
+            if len(self._ends) else 0
+
+        return missing - overrun
+
+def gaps_file(stem):
+    """
+    Returns the file the gap index of the data set `stem` is saved as
+    """
+    return stem + '_gaps.json'
+
+def update_gap_index(stem, product):
+    """
+    Builds the gap index of the clean data `stem` and saves it, see
+    load_noaa_tides_data_product() and update_clean_data()
+    """
+    df = read_clean_data(stem)
+    if df is None:
+        return None
+
+    gap_index = GapIndex.from_index(df.index.sort_values(),
+                                    PRODUCT_INTERVALS.get(product, '6min'))
+
+    meta = dict(gap_index.to_json(), source=cache_version(stem))
+    with open(gaps_file(stem) + '.tmp', 'w') as f:
+        json.dump(meta, f, indent=1)
+    os.replace(gaps_file(stem) + '.tmp', gaps_file(stem))
+
+    return gap_index
+
+def load_gap_index(stem, product):
+    """
+    Returns the saved gap index of `stem`, rebuilt first if the clean data
+    has changed since. None if there is no clean data.
+    """
+    if not is_cached(stem):
+        return None
+
+    if os.path.isfile(gaps_file(stem)):
+        with open(gaps_file(stem)) as f:
+            meta = json.load(f)
+
+        if meta['source'] == cache_version(stem):
+            return GapIndex(meta['first'], meta['last'], meta['interval'], meta['gaps'])
+
+    return update_gap_index(stem, product)
+
+def open_gap_index(location, product, use_all_time_data=False):
+    """
+    Returns the gap index of the location's station and `product`, see
+    load_gap_index()
+    """
+    # imported here, load_noaa_tides_data builds the index at ingest
+    from load_noaa_tides_data import get_data_stem
+
+    return load_gap_index(get_data_stem(location, product, use_all_time_data), product)
@@ -0,0 +1,218 @@
+"""
+Memory-mapped copies of the clean tides data for repeated analysis.
+
+Each station/product is exported once to fixed-width binary arrays, one
+numpy `.npy` file per column next to the clean data:
+
+    data/noaa_water_level_8418150_clean_arrays/meta.json
+                                               <version>/Date Time.npy     datetime64[ns]
+                                               <version>/Water Level.npy   float32
+                                               <version>/Prediction.npy    float32
+
+Every export writes a new version directory and then replaces meta.json,
+which names it, in one step. A reader always gets the columns of one
+export, even while the arrays are being exported again.
+
+The files are opened with `numpy.memmap`, so opening them costs no reading
+and processes working on the same station share the pages in the OS page
+cache instead of each holding a private copy. A date range is found with a
+binary search on the sorted timestamps and returned as views, no data is
+copied:
+
+    arrays = open_arrays(location, 'water_level')
+    levels = arrays.select(location)['Water Level']
+
+The arrays are exported again when the clean data changes.
+data_editing.find_waterlvl_diff_avg_month() computes its monthly residuals
+from them.
+
+DS5110 Fall 2023 Project Team 8 SDG
+"""
+
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+from load_noaa_tides_data import load_noaa_tides_data_product, get_data_stem
+from tides_cache import is_cached, read_clean_data, cache_version
+
+class TidesArrays:
+    """
+    Memory-mapped timestamps and measurement columns of one station/product
+
+    Parameters
+    ----------
+    directory : str
+      Directory written by export_arrays()
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+        # an export finishing between reading meta.json and opening the
+        # files removes the version read, read meta.json again
+        for attempt in range(3):
+            self.meta = read_meta(directory)
+            try:
+                self.times = self._open('Date Time')
+                self.columns = {column: self._open(column) for column in self.meta['columns']}
+                break
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+
+    def __len__(self):
+        return len(self.times)
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def rows(self, start_date=None, end_date=None):
+        """
+        Returns the slice of rows between the dates, found by binary search.
+        The end date is inclusive like select_by_dates()
+
+        Parameters
+        ----------
+        start_date, end_date : str, optional
+          Dates in format `YYYYMMDD`
+        """
+        first = 0
+        last = len(self.times)
+
+        if start_date is not None:
+            first = np.searchsorted(self.times, np.datetime64(pd.Timestamp(start_date)), 'left')
+        if end_date is not None:
+            end = pd.Timestamp(end_date) + pd.Timedelta(days=1)
+            last = np.searchsorted(self.times, np.datetime64(end), 'left')
+
+        return slice(int(first), int(last))
+
+    def select(self, location):
+        """
+        Returns a dict of "Date Time" and each column for the location's date
+        range, as views of the mapped files
+        """
+        rows = self.rows(location.start_date, location.end_date)
+
+        selected = {'Date Time': self.times[rows]}
+        for column, values in self.columns.items():
+            selected[column] = values[rows]
+
+        return selected
+
+    def to_frame(self, location):
+        """
+        Returns the location's date range as a DataFrame with a "Date Time"
+        index. Unlike select(), the values are copied
+        """
+        selected = self.select(location)
+        index = pd.DatetimeIndex(selected.pop('Date Time'), name='Date Time')
+
+        return pd.DataFrame({column: np.array(values) for column, values in selected.items()},
+                            index=index)
+
+    def _open(self, column):
+        return np.load(os.path.join(self.directory, self.meta['version'], column + '.npy'),
+                       mmap_mode='r')
+
+def arrays_dir(stem):
+    """
+    Returns the directory the arrays of the data set `stem` are exported to
+    """
+    return stem + '_arrays'
+
+def read_meta(directory):
+    """
+    Returns the metadata of the current export in `directory`, None if
+    there is none
+    """
+    meta_file = os.path.join(directory, 'meta.json')
+    if not os.path.isfile(meta_file):
+        return None
+
+    with open(meta_file) as f:
+        return json.load(f)
+
+def export_arrays(stem):
+    """
+    Writes the clean data of `stem` as one `.npy` file per column in a new
+    version directory, then switches meta.json to it. The version replaced
+    is removed, processes that still map its files keep reading them until
+    they reopen.
+    """
+    df = read_clean_data(stem)
+    if df is None:
+        return None
+
+    directory = arrays_dir(stem)
+    source = cache_version(stem)
+    version = f"{source[:12]}-{os.getpid()}-{time.time_ns()}"
+    os.makedirs(os.path.join(directory, version), exist_ok=True)
+
+    df = df.sort_index()
+    columns = list(df.select_dtypes(include='number').columns)
+
+    _save(directory, version, 'Date Time', df.index.values.astype('datetime64[ns]'))
+    for column in columns:
+        _save(directory, version, column, df[column].to_numpy())
+
+    previous = read_meta(directory)
+
+    meta = {'columns': columns, 'source': source, 'rows': len(df), 'version': version}
+    meta_file = os.path.join(directory, 'meta.json')
+    with open(meta_file + f'.{version}.tmp', 'w') as f:
+        json.dump(meta, f, indent=1)
+    os.replace(meta_file + f'.{version}.tmp', meta_file)
+
+    # the version replaced, or the files of the layout without versions
+    if previous is not None and previous.get('version') not in (None, version):
+        shutil.rmtree(os.path.join(directory, previous['version']), ignore_errors=True)
+    for entry in os.listdir(directory):
+        if entry.endswith('.npy'):
+            os.remove(os.path.join(directory, entry))
+
+    return directory
+
+def _save(directory, version, column, values):
+    with open(os.path.join(directory, version, column + '.npy'), 'wb') as f:
+        np.save(f, np.ascontiguousarray(values))
+
+def open_arrays(location, product, use_all_time_data=False):
+    """
+    Returns the memory-mapped arrays of the location's station and
+    `product`, exporting them first if they are missing or older than the
+    clean data. Downloads the data if it isn't on disk yet.
+
+    Parameters
+    ----------
+    location : Location
+      Station, see TidesArrays.select() for the date range
+
+    product : str
+      `water_level`, `hourly_height`, `water_temperature` or `air_temperature`
+
+    use_all_time_data : bool, optional
+      See load_noaa_tides_data_product()
+    """
+    stem = get_data_stem(location, product, use_all_time_data)
+
+    if not is_cached(stem):
+        start_date, end_date = location.start_date, location.end_date
+        # downloads and cleans the data
+        load_noaa_tides_data_product(location, product, use_all_time_data,
+                                     date_time_columns=False)
+        location.start_date, location.end_date = start_date, end_date
+        stem = get_data_stem(location, product, use_all_time_data)
+
+    directory = arrays_dir(stem)
+    meta = read_meta(directory)
+
+    # arrays exported before versioned directories have no version
+    if meta is None or meta.get('version') is None or meta['source'] != cache_version(stem):
+        print(f"Exporting '{stem}' to '{directory}'")
+        export_arrays(stem)
+
+    return TidesArrays(directory)
@@ -0,0 +1,250 @@
+"""
+Pre-aggregated rollups of clean tides data at several resolutions, one
+pyramid per data set:
+
+    data/noaa_water_level_8418150_clean_pyramid/hour.parquet
+                                                 day.parquet
+                                                 month.parquet
+                                                 year.parquet
+
+Every level has the mean, minimum, maximum and count of each measurement
+column per period, indexed by the start of the period. The hour level is
+built from the clean data and each coarser level from the one below it.
+After an update (see tides_cache.append_clean_data()) only the monthly
+partitions that were rewritten are read again.
+
+    query_pyramid(stem, '19960101', '20230930', 'month')
+
+answers a 27 year monthly chart from the month level, without reading the
+6-minute data at all.
+
+DS5110 Fall 2023 Project Team 8 SDG
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+from tides_cache import get_cache_backend, cache_path, read_clean_data, \
+    data_files, file_signature
+
+# levels from the finest to the coarsest, with their period frequency
+# (numpy datetime unit)
+PYRAMID_LEVELS = {
+    'hour': 'h',
+    'day': 'D',
+    'month': 'M',
+    'year': 'Y'
+}
+
+# statistics kept per measurement column, columns are named e.g.
+# "Water Level Mean"
+PYRAMID_STATS = ['Mean', 'Min', 'Max', 'Count']
+
+def pyramid_dir(stem):
+    """
+    Returns the directory the pyramid of the data set `stem` is saved in
+    """
+    return stem + '_pyramid'
+
+def update_pyramid(stem, backend=None):
+    """
+    Brings the pyramid of `stem` up to date with the cached data. Only the
+    partitions written since the last update are read.
+
+    Returns False if there is no cached data for `stem`.
+    """
+    if backend is None:
+        backend = get_cache_backend()
+
+    files = data_files(stem, backend)
+    if files and not os.path.exists(cache_path(stem, backend)):
+        # migrate the older layout first
+        read_clean_data(stem, backend=backend)
+        files = data_files(stem, backend)
+
+    if not files:
+        return False
+
+    directory = pyramid_dir(stem)
+    sources_file = os.path.join(directory, 'sources.json')
+
+    signatures = {os.path.basename(file): file_signature(file) for file in files}
+    sources = {}
+    if os.path.isfile(sources_file):
+        with open(sources_file) as f:
+            sources = json.load(f)
+
+    if not os.path.isfile(level_file(stem, 'hour', backend)):
+        sources = {}
+
+    if sources == signatures:
+        return True
+
+    stale = [file for file in files
+             if sources.get(os.path.basename(file)) != signatures[os.path.basename(file)]]
+    print(f"Rolling up {len(stale)} of {len(files)} file(s) of '{stem}' into '{directory}'")
+
+    hours = read_level(stem, 'hour', backend) if backend.partitioned and sources else None
+    if backend.partitioned:
+        rows = backend.read_many(stale)
+    else:
+        rows = backend.read(stale[0])
+    changed = rows_to_level(rows, PYRAMID_LEVELS['hour'])
+
+    if hours is not None:
+        # replace the hours of the rewritten months, drop the months whose
+        # partition is gone. Partitions are named "YYYY-MM..."
+        months = hours.index.values.astype('datetime64[M]')
+        keep = np.isin(months, _partition_months(files)) & \
+            ~np.isin(months, _partition_months(stale))
+        changed = pd.concat([hours[keep], changed]).sort_index()
+
+    os.makedirs(directory, exist_ok=True)
+    level = changed
+    for name, freq in PYRAMID_LEVELS.items():
+        if name != 'hour':
+            level = coarsen_level(level, freq)
+        write_level(level, stem, name, backend)
+
+    with open(sources_file + '.tmp', 'w') as f:
+        json.dump(signatures, f, indent=1)
+    os.replace(sources_file + '.tmp', sources_file)
+
+    return True
+
+def _partition_months(files):
+    return np.array([os.path.basename(file)[:7] for file in files], dtype='datetime64[M]')
+
+def rows_to_level(df, freq):
+    """
+    Aggregates clean data rows (datetime index) to one row per period of
+    `freq`
+    """
+    columns = df.select_dtypes(include='number').columns
+    values = df[columns].astype(np.float64)
+
+    # each row is a period of its own with a single value
+    level = {}
+    for column in columns:
+        level[f"{column} Mean"] = values[column]
+        level[f"{column} Min"] = values[column]
+        level[f"{column} Max"] = values[column]
+        level[f"{column} Count"] = values[column].notna().astype(np.int64)
+
+    return coarsen_level(pd.DataFrame(level, index=df.index), freq)
+
+def coarsen_level(level, freq):
+    """
+    Aggregates a pyramid level to the coarser periods of `freq`. Means are
+    weighted by their counts.
+    """
+    # numpy truncates the timestamps to the period start directly
+    keys = pd.DatetimeIndex(level.index.values.astype(f'datetime64[{freq}]').astype('datetime64[ns]'))
+    columns = [name[:-len(' Count')] for name in level.columns if name.endswith(' Count')]
+
+    coarse = {}
+    for column in columns:
+        count = level[f"{column} Count"]
+        total = (level[f"{column} Mean"] * count).groupby(keys).sum()
+        count = count.groupby(keys).sum()
+
+        coarse[f"{column} Mean"] = total.where(count > 0) / count.where(count > 0)
+        coarse[f"{column} Min"] = level[f"{column} Min"].groupby(keys).min()
+        coarse[f"{column} Max"] = level[f"{column} Max"].groupby(keys).max()
+        coarse[f"{column} Count"] = count
+
+    coarse = pd.DataFrame(coarse)
+    coarse.index.name = 'Date Time'
+
+    return coarse
+
+def level_for(start_date, end_date, resolution='day'):
+    """
+    Returns the coarsest pyramid level at most as coarse as `resolution`
+    whose periods line up with the date range, e.g. 'month' for
+    `19960101` to `20230930` but 'day' for `20230503` to `20230930`.
+
+    Parameters
+    ----------
+    start_date, end_date : str or None
+      Inclusive date range in format `YYYYMMDD`
+
+    resolution : str, optional
+      'hour', 'day', 'month' or 'year'
+    """
+    if resolution not in PYRAMID_LEVELS:
+        raise ValueError(f"unsupported resolution: '{resolution}'. "
+                         f"Choose from {list(PYRAMID_LEVELS)}")
+
+    names = list(PYRAMID_LEVELS)
+    for name in reversed(names[:names.index(resolution) + 1]):
+        freq = PYRAMID_LEVELS[name]
+        starts_aligned = start_date is None or \
+            pd.Period(start_date, freq).start_time == pd.Timestamp(start_date)
+        ends_aligned = end_date is None or \
+            pd.Period(end_date, freq).end_time.normalize() == pd.Timestamp(end_date)
+
+        if starts_aligned and ends_aligned:
+            return name
+
+    return names[0]
+
+def query_pyramid(stem, start_date=None, end_date=None, resolution='day', columns=None,
+                  backend=None):
+    """
+    Returns the rollups of `stem` in the date range from the coarsest level
+    that satisfies `resolution` and the range, see level_for(). Indexed by
+    "Date Time", the start of each period, with "{column} Mean", "Min",
+    "Max" and "Count" columns.
+
+    Parameters
+    ----------
+    stem : str
+      Cached data set, see tides_cache.read_clean_data()
+
+    start_date, end_date : str, optional
+      Inclusive date range in format `YYYYMMDD`
+
+    resolution : str, optional
+      Coarsest spacing wanted: 'hour', 'day', 'month' or 'year'
+
+    columns : list of str, optional
+      Measurement columns to return, e.g. `['Water Level']`. All if not given
+
+    Returns None if there is no cached data for `stem`.
+    """
+    if backend is None:
+        backend = get_cache_backend()
+
+    if not update_pyramid(stem, backend):
+        return None
+
+    level = read_level(stem, level_for(start_date, end_date, resolution), backend)
+    level = level.loc[start_date:end_date]
+
+    if columns is not None:
+        level = level[[f"{column} {stat}" for column in columns for stat in PYRAMID_STATS]]
+
+    return level
+
+def level_file(stem, name, backend):
+    return os.path.join(pyramid_dir(stem), name + backend.extension)
+
+def read_level(stem, name, backend):
+    level = backend.read(level_file(stem, name, backend))
+
+    # the csv backend reads every number back as float32
+    counts = [column for column in level.columns if column.endswith(' Count')]
+    level[counts] = level[counts].astype(np.int64)
+
+    return level
+
+def write_level(level, stem, name, backend):
+    level = level.copy()
+    stats = [column for column in level.columns if not column.endswith(' Count')]
+    level[stats] = level[stats].astype(np.float32)
+
+    filename = level_file(stem, name, backend)
+    backend.write(level, filename + '.tmp')
+    os.replace(filename + '.tmp', filename)
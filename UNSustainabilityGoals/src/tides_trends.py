@@ -0,0 +1,138 @@
+"""
+Linear trends of many time series at once, as a table.
+
+Every column of a wide frame (e.g. the monthly means of five stations and
+four products, see station_batch.product_batch()) gets its slope per year,
+intercept, standard error and confidence interval from closed form least
+squares, all columns in the same few NumPy operations:
+
+    trends = linear_trends(wide)
+
+With `seasonal=True` (default) the seasonal cycle is removed first: the
+fit is the same as a regression with one dummy per calendar month, so the
+slope isn't biased by which months a station happens to be missing.
+
+DS5110 Fall 2023 Project Team 8 SDG
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+# days per year used to express slopes per year
+DAYS_PER_YEAR = 365.2425
+
+def linear_trends(wide, seasonal=True, confidence=0.95):
+    """
+    Fits a least-squares line through every column of `wide`, leaving out
+    its NaNs
+
+    Parameters
+    ----------
+    wide : DataFrame
+      One series per column, indexed by month or year periods, timestamps
+      or (numeric) years
+
+    seasonal : bool, optional
+      Remove each column's mean seasonal cycle before fitting. Needs
+      monthly (or finer) dates in the index
+
+    confidence : float, optional
+      Level of the confidence interval of the slope
+
+    Returns a DataFrame indexed by the columns of `wide` with the "Slope"
+    per year, the "Intercept" (fitted value at the first row of `wide`),
+    the "Std Error" of the slope, "CI Low" and "CI High", and the "Count" of
+    values used.
+    """
+    x = elapsed_years(wide.index)
+    y = wide.to_numpy(dtype=np.float64)
+
+    weight = ~np.isnan(y)
+    y = np.where(weight, y, 0.0)
+    n = weight.sum(axis=0)
+
+    x_all = np.broadcast_to(x[:, np.newaxis], y.shape)
+    x_mean = (x @ weight) / np.maximum(n, 1)
+    y_mean = y.sum(axis=0) / np.maximum(n, 1)
+
+    # parameters used by the fit besides the slope: the intercept, or one
+    # mean per calendar month
+    used = np.ones(y.shape[1])
+
+    if seasonal:
+        months = _months(wide.index)
+        # one-hot calendar month of every row
+        month_of_row = np.zeros((len(months), 12))
+        month_of_row[np.arange(len(months)), months] = 1
+
+        # per column means of x and y in each calendar month
+        month_count = month_of_row.T @ weight
+        month_x = (month_of_row.T @ (weight * x_all)) / np.maximum(month_count, 1)
+        month_y = (month_of_row.T @ y) / np.maximum(month_count, 1)
+
+        x_dev = x_all - month_x[months]
+        y_dev = y - month_y[months]
+        used = (month_count > 0).sum(axis=0)
+    else:
+        x_dev = x_all - x_mean
+        y_dev = y - y_mean
+
+    x_dev = np.where(weight, x_dev, 0.0)
+    y_dev = np.where(weight, y_dev, 0.0)
+
+    sxx = (x_dev ** 2).sum(axis=0)
+    sxy = (x_dev * y_dev).sum(axis=0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = sxy / sxx
+        residual = y_dev - x_dev * slope
+        dof = n - used - 1
+        variance = (np.where(weight, residual, 0.0) ** 2).sum(axis=0) / dof
+        std_error = np.sqrt(variance / sxx)
+
+    # too few values for a line (or its error)
+    slope[(n < 2) | (sxx == 0)] = np.nan
+    std_error[dof <= 0] = np.nan
+
+    critical = stats.t.ppf((1 + confidence) / 2, np.maximum(dof, 1))
+    intercept = y_mean - slope * (x_mean - x[0]) if len(x) else np.full(len(n), np.nan)
+
+    return pd.DataFrame({
+        'Slope': slope,
+        'Intercept': intercept,
+        'Std Error': std_error,
+        'CI Low': slope - critical * std_error,
+        'CI High': slope + critical * std_error,
+        'Count': n
+    }, index=wide.columns)
+
+def _timestamps(index):
+    if isinstance(index, pd.PeriodIndex):
+        return index.to_timestamp()
+
+    return pd.DatetimeIndex(index)
+
+def elapsed_years(index):
+    """
+    Returns the index as (fractional) years since its first row
+    """
+    if len(index) == 0:
+        return np.zeros(0)
+
+    if pd.api.types.is_numeric_dtype(index):
+        values = np.asarray(index, dtype=np.float64)
+        return values - values[0]
+
+    days = (_timestamps(index) - _timestamps(index)[0]) / pd.Timedelta(days=1)
+
+    return np.asarray(days, dtype=np.float64) / DAYS_PER_YEAR
+
+def _months(index):
+    """
+    Returns the calendar month (0 to 11) of every row
+    """
+    if pd.api.types.is_numeric_dtype(index):
+        raise ValueError("seasonal trends need a monthly date index, use seasonal=False")
+
+    return np.asarray(_timestamps(index).month) - 1
@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+import data_editing
+from location_class import Location
+from tides_gaps import GapIndex
+
+def test_fill_missing_months_keeps_the_location_dates(monkeypatch):
+    # hourly data from 2020-01 to 2024-06, with 2022-05 missing
+    grid = pd.date_range('2020-01-01', '2024-06-30 23:00', freq='1h')
+    gaps = GapIndex.from_index(grid[(grid < '2022-05-01') | (grid >= '2022-06-01')], '1h')
+    monkeypatch.setattr(data_editing, 'open_gap_index', lambda location, product: gaps)
+
+    months = pd.period_range('2022-01', '2023-09', freq='M')
+    averages = pd.DataFrame({'Month': months.strftime('%Y-%m'),
+                             'Water Level': np.arange(len(months), dtype=float)})
+    averages = averages[averages['Month'] != '2022-05']
+
+    location = Location('20220101', '20230930', '8418150')
+    df = data_editing.fill_missing_months(averages, location)
+
+    assert df.index.tolist() == months.strftime('%Y-%m').tolist()
+    assert df['Water Level'].isna().sum() == 1
+    assert np.isnan(df.loc['2022-05', 'Water Level'])
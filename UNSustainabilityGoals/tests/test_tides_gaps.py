@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+import pytest
+from tides_gaps import GapIndex, PRODUCT_INTERVALS
+
+@pytest.mark.parametrize('product', sorted(PRODUCT_INTERVALS))
+def test_gap_index_for_every_product(product):
+    interval = PRODUCT_INTERVALS[product]
+    grid = pd.date_range('2020-01-01', periods=100, freq=pd.Timedelta(interval))
+    # drop stamps 10 to 19
+    index = grid.delete(np.arange(10, 20))
+
+    gaps = GapIndex.from_index(index, interval)
+
+    assert len(gaps) == 1
+    assert gaps.gaps['Missing'].tolist() == [10]
+    assert gaps.grid().equals(pd.DatetimeIndex(grid, name='Date Time'))
+    assert gaps.mask(grid).sum() == 10
+    assert gaps.coverage_by_month()['Observed'].sum() == 90
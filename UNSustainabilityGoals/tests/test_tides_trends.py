@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+from tides_trends import linear_trends, elapsed_years
+from station_batch import fit_trends, trend_lines
+
+@pytest.fixture
+def wide():
+    rng = np.random.default_rng(0)
+    months = pd.period_range('1996-01', '2023-09', freq='M', name='Month')
+    season = 5 * np.sin(2 * np.pi * np.arange(len(months)) / 12)[:, np.newaxis]
+    trend = 0.03 * elapsed_years(months)[:, np.newaxis] * np.arange(1, 5)
+    values = season + trend + rng.normal(0, 1, (len(months), 4))
+
+    # missing months, and a column starting later
+    values[rng.random(values.shape) < 0.15] = np.nan
+    values[:100, 3] = np.nan
+
+    return pd.DataFrame(values, index=months, columns=['a', 'b', 'c', 'd'])
+
+def test_slope_and_intercept_match_polyfit(wide):
+    trends = linear_trends(wide, seasonal=False)
+    x = elapsed_years(wide.index)
+
+    for column in wide.columns:
+        observed = wide[column].notna().to_numpy()
+        slope, intercept = np.polyfit(x[observed], wide[column].to_numpy()[observed], 1)
+
+        assert trends.loc[column, 'Slope'] == pytest.approx(slope)
+        assert trends.loc[column, 'Intercept'] == pytest.approx(intercept)
+        assert trends.loc[column, 'Count'] == observed.sum()
+
+def test_seasonal_slope_and_error_match_month_dummies(wide):
+    trends = linear_trends(wide)
+    x = elapsed_years(wide.index)
+
+    for column in wide.columns:
+        observed = wide[column].notna().to_numpy()
+        months = wide.index.month[observed]
+        design = np.column_stack([x[observed]] + [(months == m).astype(float) for m in range(1, 13)])
+        y = wide[column].to_numpy()[observed]
+
+        solution, residual, _, _ = np.linalg.lstsq(design, y, rcond=None)
+        variance = residual[0] / (len(y) - design.shape[1])
+        std_error = np.sqrt(variance * np.linalg.inv(design.T @ design)[0, 0])
+
+        assert trends.loc[column, 'Slope'] == pytest.approx(solution[0])
+        assert trends.loc[column, 'Std Error'] == pytest.approx(std_error)
+        assert trends.loc[column, 'CI Low'] < solution[0] < trends.loc[column, 'CI High']
+
+def test_too_few_values():
+    wide = pd.DataFrame({'one': [np.nan, 1.0, np.nan], 'two': [1.0, np.nan, 3.0]},
+                        index=pd.period_range('2020-01', periods=3, freq='M'))
+    trends = linear_trends(wide, seasonal=False)
+
+    assert np.isnan(trends.loc['one', 'Slope'])
+    assert trends.loc['two', 'Slope'] == pytest.approx(2 / elapsed_years(wide.index)[2])
+    assert np.isnan(trends.loc['two', 'Std Error'])
+
+def test_fit_trends_lines(wide):
+    trends = fit_trends(wide)
+    lines = trend_lines(wide, trends)
+
+    assert trends.index.name == 'Station'
+    assert lines['d'].iloc[:100].isna().all()
+
+    # the fitted line passes through the mean of the observed months
+    observed = wide['a'].notna()
+    assert lines['a'][observed].mean() == pytest.approx(wide['a'][observed].mean())